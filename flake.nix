@@ -22,6 +22,7 @@
         pythonEnv = python.withPackages (ps: [
           ps.pypdf2
           ps.reportlab
+          ps.pillow
           ps.tkinter
           ps.pyinstaller
         ]);
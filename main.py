@@ -1,5 +1,9 @@
+import multiprocessing
+
 from scripts.gui import main as gui_main
 
 
 if __name__ == "__main__":
+    # Needed for the worker processes of the PyInstaller --onefile build
+    multiprocessing.freeze_support()
     gui_main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+from scripts.bench_imposition import generate_input  # noqa: E402
+from scripts.compression import COMPRESSION_PROFILES  # noqa: E402
+from scripts.sort import collect_pages_by_size, write_imposed_pdfs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Schreibzeit und Dateigröße je Kompressionsprofil vergleichen."
+    )
+    parser.add_argument("--source", help="Ordner mit Quell-PDFs (Standard: erzeugte A5-Seiten)")
+    parser.add_argument("--pages", type=int, default=2000, help="erzeugte A5-Seiten ohne --source")
+    parser.add_argument("--link-mbit", type=float, default=100.0,
+                        help="Übertragungsrate zum Drucker-Spooler für die Gesamtzeit")
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hm-druck-bench-compression-")
+    try:
+        source = args.source
+        if source is None:
+            source = os.path.join(tmp, "input")
+            os.makedirs(source)
+            generate_input(source, args.pages)
+
+        pages_by_size = collect_pages_by_size(source)
+        bytes_per_second = args.link_mbit * 1e6 / 8
+
+        print(f"{'Profil':10s} {'Montage+Schreiben':>18s} {'davon Packen':>13s} "
+              f"{'Bytes':>14s} {'Spool':>9s} {'Summe':>9s}")
+        for profile in COMPRESSION_PROFILES:
+            best = None
+            for run in range(args.runs):
+                output = os.path.join(tmp, f"{profile}_{run}")
+                reports = {}
+                start = time.perf_counter()
+                outputs = write_imposed_pdfs(pages_by_size, output, compression=profile,
+                                             compression_reports=reports)
+                elapsed = time.perf_counter() - start
+                size = sum(os.path.getsize(path) for path in outputs.values())
+                packing = sum(report["seconds"] for report in reports.values())
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, packing, size)
+
+            elapsed, packing, size = best
+            spool = size / bytes_per_second
+            print(f"{profile:10s} {elapsed:16.2f} s {packing:11.2f} s "
+                  f"{size:14,d} {spool:7.2f} s {elapsed + spool:7.2f} s")
+        print(f"(Spool bei {args.link_mbit:g} Mbit/s)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
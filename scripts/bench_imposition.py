@@ -0,0 +1,168 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+from PyPDF2 import PageObject, PdfReader, PdfWriter, Transformation  # noqa: E402
+from PyPDF2.generic import (  # noqa: E402
+    DictionaryObject,
+    EncodedStreamObject,
+    NameObject,
+)
+
+from scripts.sort import add_two_up_pages  # noqa: E402
+
+A5_POINTS = (419.53, 595.28)
+PAGES_PER_FILE = 1000
+
+
+def _font():
+    font = DictionaryObject()
+    font[NameObject("/Type")] = NameObject("/Font")
+    font[NameObject("/Subtype")] = NameObject("/Type1")
+    font[NameObject("/BaseFont")] = NameObject("/Helvetica")
+    return font
+
+
+def generate_input(directory, pages):
+    """
+    Erzeugt A5-Test-PDFs mit zusammen `pages` Seiten (je Seite etwas Text
+    und ein paar Rechtecke, Flate-komprimiert) und gibt die Einträge im
+    Format von collect_pages_by_size zurück.
+    """
+    width, height = A5_POINTS
+    fonts = DictionaryObject()
+    fonts[NameObject("/F1")] = _font()
+    entries = []
+
+    for file_index in range(0, (pages + PAGES_PER_FILE - 1) // PAGES_PER_FILE):
+        path = os.path.join(directory, f"bench_{file_index:03d}.pdf")
+        writer = PdfWriter()
+        count = min(PAGES_PER_FILE, pages - file_index * PAGES_PER_FILE)
+        for n in range(count):
+            page = PageObject.create_blank_page(width=width, height=height)
+            lines = [f"BT /F1 24 Tf 40 {height - 60:.0f} Td (Seite {file_index}-{n}) Tj ET"]
+            for row in range(12):
+                lines.append(f"0.{row % 9} g 40 {60 + row * 40} {width - 80:.0f} 20 re f")
+            content = EncodedStreamObject()
+            content._data = zlib.compress("\n".join(lines).encode("ascii"))
+            content[NameObject("/Filter")] = NameObject("/FlateDecode")
+            page[NameObject("/Contents")] = content
+            resources = DictionaryObject()
+            resources[NameObject("/Font")] = fonts
+            page[NameObject("/Resources")] = resources
+            writer.add_page(page)
+        with open(path, "wb") as f:
+            writer.write(f)
+        entries.extend({"path": path, "page_index": n} for n in range(count))
+    return entries
+
+
+def naive_two_up(writer, entries):
+    # Frühere Schleife: je Eintrag ein neuer Reader, leerer Bogen und
+    # merge_page/add_transformation, die die Inhalts-Streams neu parsen.
+    for i in range(0, len(entries), 2):
+        page_left = PdfReader(entries[i]["path"]).pages[entries[i]["page_index"]]
+        page_width = float(page_left.mediabox.width)
+        page_height = float(page_left.mediabox.height)
+        merged = PageObject.create_blank_page(width=page_width * 2, height=page_height)
+        if i + 1 < len(entries):
+            info = entries[i + 1]
+            merged.merge_page(PdfReader(info["path"]).pages[info["page_index"]])
+            merged.add_transformation(Transformation().translate(tx=page_width, ty=0))
+        merged.merge_page(page_left)
+        writer.add_page(merged)
+
+
+def open_readers(entries):
+    # Ein Reader pro Datei, Seitenbaum schon aufgelöst: so misst
+    # merge_two_up nur das Platzieren selbst.
+    readers = {}
+    for info in entries:
+        if info["path"] not in readers:
+            reader = PdfReader(info["path"])
+            len(reader.pages)
+            readers[info["path"]] = reader
+    return readers
+
+
+def merge_two_up(writer, entries, readers):
+    # Früherer Platzierungsweg (merge_page/add_transformation) mit
+    # zwischengespeicherten Readern.
+    for i in range(0, len(entries), 2):
+        info = entries[i]
+        page_left = readers[info["path"]].pages[info["page_index"]]
+        page_width = float(page_left.mediabox.width)
+        page_height = float(page_left.mediabox.height)
+        merged = PageObject.create_blank_page(width=page_width * 2, height=page_height)
+        if i + 1 < len(entries):
+            info = entries[i + 1]
+            merged.merge_page(readers[info["path"]].pages[info["page_index"]])
+            merged.add_transformation(Transformation().translate(tx=page_width, ty=0))
+        merged.merge_page(page_left)
+        writer.add_page(merged)
+
+
+def run(label, func, entries, write):
+    writer = PdfWriter()
+    start = time.perf_counter()
+    func(writer, entries)
+    impose_seconds = time.perf_counter() - start
+
+    write_seconds = 0.0
+    if write:
+        start = time.perf_counter()
+        with open(os.devnull, "wb") as f:
+            writer.write(f)
+        write_seconds = time.perf_counter() - start
+
+    sheets = len(writer.pages)
+    print(f"{label:10s} {sheets:6d} Bögen  Montage {impose_seconds:7.2f} s "
+          f"({impose_seconds / sheets * 1e6:8.0f} µs/Bogen)"
+          + (f"  Schreiben {write_seconds:6.2f} s ({write_seconds / sheets * 1e6:6.0f} µs/Bogen)"
+             if write else ""))
+    return impose_seconds / sheets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kosten pro Bogen bei der 2-up-Montage messen.")
+    parser.add_argument("--sheets", type=int, default=10000)
+    parser.add_argument("--baseline", action="store_true",
+                        help="zusätzlich den früheren merge_page-Weg messen (mit "
+                             "zwischengespeicherten Readern und als naive Schleife)")
+    parser.add_argument("--baseline-sheets", type=int, default=500,
+                        help="Bögen für die Vergleichsläufe (sehr langsam)")
+    parser.add_argument("--write", action="store_true", help="auch das Schreiben messen")
+    parser.add_argument("--keep", metavar="DIR", help="Test-PDFs hier erzeugen und behalten")
+    args = parser.parse_args()
+
+    directory = args.keep or tempfile.mkdtemp(prefix="hm-druck-bench-")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        entries = generate_input(directory, args.sheets * 2)
+        print(f"{len(entries)} A5-Seiten erzeugt in {time.perf_counter() - start:.1f} s")
+
+        per_sheet = run("Vorlagen", add_two_up_pages, entries, args.write)
+        if args.baseline:
+            sample = entries[:args.baseline_sheets * 2]
+            readers = open_readers(sample)
+            merge = run("merge", lambda writer, entries: merge_two_up(writer, entries, readers),
+                        sample, args.write)
+            naive = run("naiv", naive_two_up, sample, args.write)
+            print(f"Faktor gegenüber merge: {merge / per_sheet:.1f}x, "
+                  f"gegenüber naiv: {naive / per_sheet:.1f}x")
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
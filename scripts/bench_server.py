@@ -0,0 +1,101 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+from scripts.bench_imposition import generate_input  # noqa: E402
+from scripts.client import JobClient, ServerError  # noqa: E402
+from scripts.server import JobServer, create_http_server  # noqa: E402
+
+
+def run_job(client, source, upload, target):
+    start = time.perf_counter()
+    rejected = 0
+    while True:
+        try:
+            job = client.upload(source) if upload else client.submit_directory(source)
+            break
+        except ServerError as e:
+            if e.status != 503:
+                raise
+            rejected += 1
+            time.sleep(e.retry_after or 1)
+
+    job = client.wait(job["id"], interval=0.1)
+    if job["state"] == "done":
+        client.fetch_all(job, os.path.join(target, job["id"]))
+    client.delete(job["id"])
+    return time.perf_counter() - start, job["state"], rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durchsatz des Auftrags-Servers bei parallelen Aufträgen.")
+    parser.add_argument("--server", help="laufenden Server nutzen statt einen lokalen zu starten")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=4, help="gleichzeitig sendende Clients")
+    parser.add_argument("--pages", type=int, default=200, help="A5-Seiten pro Auftrag")
+    parser.add_argument("--upload", action="store_true", help="PDFs hochladen statt Pfad schicken")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--max-queued", type=int, default=4)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hm-druck-bench-server-")
+    httpd = None
+    job_server = None
+    try:
+        source = os.path.join(tmp, "input")
+        os.makedirs(source)
+        generate_input(source, args.pages)
+
+        address = args.server
+        if address is None:
+            job_server = JobServer(os.path.join(tmp, "work"), concurrency=args.concurrency,
+                                   max_queued=args.max_queued)
+            httpd = create_http_server(job_server, port=0)
+            job_server.start()
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            address = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+        client = JobClient(address)
+        target = os.path.join(tmp, "output")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as executor:
+            results = list(executor.map(
+                lambda _: run_job(client, source, args.upload, target), range(args.jobs)
+            ))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, _, _ in results)
+        failed = sum(1 for _, state, _ in results if state != "done")
+        rejected = sum(r for _, _, r in results)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+        print(f"{args.jobs} Aufträge à {args.pages} Seiten, {args.clients} Clients, "
+              f"{'Upload' if args.upload else 'Pfad'}")
+        print(f"Gesamt {elapsed:.1f} s  →  {args.jobs / elapsed * 60:.1f} Aufträge/min, "
+              f"{args.jobs * args.pages / elapsed:.0f} Seiten/s")
+        print(f"Latenz Median {statistics.median(latencies):.2f} s, p95 {p95:.2f} s, "
+              f"max {latencies[-1]:.2f} s")
+        print(f"Fehlgeschlagen: {failed}, abgewiesen (503, erneut versucht): {rejected}")
+        print(f"Server: {client.status()}")
+        return 1 if failed else 0
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+        if job_server is not None:
+            job_server.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPT_DIR)
+
+# Darf beim Start nicht geladen werden (kommt erst beim ersten Auftrag/Druck)
+LAZY_MODULES = [
+    "PyPDF2",
+    "PIL",
+    "win32api",
+    "win32print",
+    "scripts.sort",
+    "scripts.print",
+    "scripts.images",
+]
+
+
+def measure_imports(module):
+    """
+    Startet einen frischen Interpreter mit "-X importtime" und gibt
+    { Modulname: kumulative Importzeit in µs } zurück.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startzeit der GUI-Module messen (-X importtime).")
+    parser.add_argument("--module", default="scripts.gui")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fehlschlag, wenn der Median darüber liegt")
+    args = parser.parse_args()
+
+    totals = []
+    timings = {}
+    for _ in range(args.runs):
+        timings = measure_imports(args.module)
+        totals.append(timings.get(args.module, 0) / 1000.0)
+
+    median_ms = statistics.median(totals)
+    print(f"{args.module}: Median {median_ms:.1f} ms über {args.runs} Läufe "
+          f"(min {min(totals):.1f} ms, max {max(totals):.1f} ms)")
+
+    print("Langsamste Importe (letzter Lauf, kumulativ):")
+    for name, us in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000.0:8.1f} ms  {name}")
+
+    failed = False
+
+    eager = [
+        name for name in timings
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    ]
+    if eager:
+        print("FEHLER: beim Start geladen, sollte erst bei Bedarf kommen:")
+        for name in sorted(eager):
+            print(f"  {name}")
+        failed = True
+
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"FEHLER: {median_ms:.1f} ms > Budget {args.budget_ms:.1f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
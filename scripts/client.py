@@ -0,0 +1,161 @@
+import argparse
+import http.client
+import io
+import json
+import os
+import socket
+import sys
+import time
+import zipfile
+from urllib.parse import quote, urlsplit
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class ServerError(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class JobClient:
+    """
+    Client für scripts/server.py.
+
+    address: "http://host:port" oder "unix:/pfad/zum/socket"
+    """
+
+    def __init__(self, address=DEFAULT_URL, timeout=60):
+        self.address = address
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.address.startswith("unix:"):
+            return _UnixHTTPConnection(self.address[len("unix:"):], self.timeout)
+        parts = urlsplit(self.address)
+        return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, body=None, headers=None, raw=False):
+        conn = self._connection()
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+            except (BrokenPipeError, ConnectionResetError):
+                # Server hat vorzeitig geantwortet (413/503) und den Upload
+                # abgebrochen; die Antwort liegt trotzdem schon vor.
+                pass
+            response = conn.getresponse()
+            data = response.read()
+        finally:
+            conn.close()
+
+        if response.status >= 400:
+            try:
+                message = json.loads(data)["error"]
+            except Exception:
+                message = data.decode("utf-8", "replace")
+            retry_after = response.getheader("Retry-After")
+            raise ServerError(response.status, message,
+                              float(retry_after) if retry_after else None)
+        return data if raw else json.loads(data)
+
+    def status(self):
+        return self._request("GET", "/status")
+
+    def submit_directory(self, source):
+        """Auftrag für einen Ordner, den der Server selbst lesen kann."""
+        body = json.dumps({"source": os.path.abspath(source)}).encode("utf-8")
+        return self._request("POST", "/jobs", body, {"Content-Type": "application/json"})
+
+    def upload(self, path):
+        """Lädt eine PDF oder alle PDFs eines Ordners (als ZIP) hoch."""
+        if os.path.isdir(path):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+                for name in sorted(os.listdir(path)):
+                    if name.lower().endswith(".pdf"):
+                        archive.write(os.path.join(path, name), name)
+            body = buffer.getvalue()
+            content_type = "application/zip"
+            name = os.path.basename(os.path.normpath(path)) + ".zip"
+        else:
+            with open(path, "rb") as f:
+                body = f.read()
+            content_type = "application/pdf"
+            name = os.path.basename(path)
+        return self._request("POST", f"/jobs?name={quote(name)}", body,
+                             {"Content-Type": content_type})
+
+    def job(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def wait(self, job_id, interval=0.5, timeout=None):
+        start = time.monotonic()
+        while True:
+            job = self.job(job_id)
+            if job["state"] in ("done", "failed"):
+                return job
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"Auftrag {job_id} nach {timeout:g} s nicht fertig")
+            time.sleep(interval)
+
+    def fetch(self, job_id, name, target_directory):
+        data = self._request("GET", f"/jobs/{job_id}/files/{quote(name)}", raw=True)
+        os.makedirs(target_directory, exist_ok=True)
+        path = os.path.join(target_directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def fetch_all(self, job, target_directory):
+        return [self.fetch(job["id"], name, target_directory) for name in job["outputs"].values()]
+
+    def delete(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auftrag an den hm-druck-Server schicken.")
+    parser.add_argument("source", help="PDF oder Ordner mit PDFs")
+    parser.add_argument("target", help="Ordner für die Ausgabe-PDFs")
+    parser.add_argument("--server", default=DEFAULT_URL,
+                        help='z. B. "http://127.0.0.1:8765" oder "unix:/tmp/hm-druck.sock"')
+    parser.add_argument("--upload", action="store_true",
+                        help="Dateien hochladen statt nur den Pfad zu schicken")
+    args = parser.parse_args(argv)
+
+    client = JobClient(args.server)
+    if args.upload or not os.path.isdir(args.source):
+        job = client.upload(args.source)
+    else:
+        job = client.submit_directory(args.source)
+    print(f"Auftrag {job['id']} angenommen")
+
+    job = client.wait(job["id"])
+    if job["state"] != "done":
+        print(f"Fehlgeschlagen: {job['error']}")
+        return 1
+
+    for path in client.fetch_all(job, args.target):
+        print(path)
+    for entry in job["skipped"]:
+        print(f"Übersprungen: {entry['file']} – {entry['reason']}")
+    client.delete(job["id"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
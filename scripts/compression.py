@@ -0,0 +1,195 @@
+import hashlib
+import time
+import zlib
+from io import BytesIO
+
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    StreamObject,
+)
+
+# fast:     Streams bleiben, wie sie sind (Verhalten von PdfWriter)
+# balanced: unkomprimierte Streams werden mit Flate (Stufe 6) gepackt
+# smallest: Flate Stufe 9, vorhandene Flate-Streams neu gepackt und
+#           identische Streams nur einmal geschrieben
+COMPRESSION_PROFILES = ("fast", "balanced", "smallest")
+DEFAULT_COMPRESSION_PROFILE = "fast"
+
+_FLATE_LEVELS = {"balanced": 6, "smallest": 9}
+
+_FILTER_ENTRY_BYTES = len(b" /Filter /FlateDecode")
+
+
+def compression_profile(compression, fmt):
+    """
+    compression: None, ein Profilname oder ein Dict je Zielformat, z. B.
+    {"default": "balanced", "A0": "fast"}.
+    """
+    if not compression:
+        profile = DEFAULT_COMPRESSION_PROFILE
+    elif isinstance(compression, str):
+        profile = compression
+    else:
+        profile = compression.get(fmt) or compression.get("default") or DEFAULT_COMPRESSION_PROFILE
+
+    if profile not in COMPRESSION_PROFILES:
+        raise ValueError(f"Unknown compression profile: {profile}")
+    return profile
+
+
+def _filters(stream):
+    filters = stream.get("/Filter")
+    if filters is None:
+        return []
+    if isinstance(filters, ArrayObject):
+        return list(filters)
+    return [filters]
+
+
+def _flate_copy(stream, data, level):
+    # Neues Stream-Objekt mit denselben Einträgen, aber Flate-kodiert
+    encoded = EncodedStreamObject()
+    for key, value in stream.items():
+        if key not in ("/Filter", "/DecodeParms", "/Length"):
+            encoded[key] = value
+    encoded[NameObject("/Filter")] = NameObject("/FlateDecode")
+    encoded._data = zlib.compress(data, level)
+    return encoded
+
+
+def _compress_stream(stream, profile):
+    # Gibt den Ersatz-Stream zurück oder None, wenn nichts kleiner wird.
+    level = _FLATE_LEVELS[profile]
+    filters = _filters(stream)
+
+    if not filters:
+        data = stream._data
+    elif profile == "smallest" and filters == ["/FlateDecode"] and "/DecodeParms" not in stream:
+        try:
+            data = zlib.decompress(stream._data)
+        except zlib.error:
+            return None
+    else:
+        return None
+
+    encoded = _flate_copy(stream, data, level)
+    # Ein neuer /Filter-Eintrag kostet selbst Bytes
+    overhead = 0 if filters else _FILTER_ENTRY_BYTES
+    if len(encoded._data) + overhead >= len(stream._data):
+        return None
+    return encoded
+
+
+def _stream_key(stream):
+    header = DictionaryObject()
+    for key, value in stream.items():
+        if key != "/Length":
+            header[key] = value
+    out = BytesIO()
+    header.write_to_stream(out, None)
+    h = hashlib.sha1(out.getvalue())
+    h.update(stream._data)
+    return h.hexdigest()
+
+
+def _replace_references(obj, replacements):
+    if isinstance(obj, DictionaryObject):
+        items = list(obj.items())
+    elif isinstance(obj, ArrayObject):
+        items = list(enumerate(obj))
+    else:
+        return
+
+    for key, value in items:
+        if isinstance(value, IndirectObject):
+            if value.idnum in replacements:
+                obj[key] = replacements[value.idnum]
+        else:
+            _replace_references(value, replacements)
+
+
+def _deduplicate_streams(writer):
+    # Identische Streams (z. B. dieselbe Schrift in jeder Quelldatei oder
+    # der gleiche Platzierungs-Inhalt jedes Bogens) zeigen danach alle auf
+    # das erste Exemplar. Die Duplikate werden zu null: die Objektnummern
+    # müssen lückenlos bleiben, weil PdfWriter die Xref-Tabelle fortlaufend
+    # schreibt.
+    first_by_key = {}
+    replacements = {}
+    for index, obj in enumerate(writer._objects):
+        if not isinstance(obj, StreamObject):
+            continue
+        key = _stream_key(obj)
+        if key in first_by_key:
+            replacements[index + 1] = first_by_key[key]
+        else:
+            first_by_key[key] = IndirectObject(index + 1, 0, writer)
+
+    if not replacements:
+        return 0
+
+    for obj in writer._objects:
+        _replace_references(obj, replacements)
+    for idnum in replacements:
+        writer._objects[idnum - 1] = NullObject()
+    return len(replacements)
+
+
+def compress_writer(writer, profile):
+    """
+    Wendet ein Kompressionsprofil auf alle Streams des writer an, bevor er
+    geschrieben wird. add_page hat zu diesem Zeitpunkt bereits jeden Stream
+    zu einem eigenen Objekt des writer gemacht.
+
+    Objekt-Streams (komprimierte Xref) kann PyPDF2 nicht schreiben; die
+    Profile arbeiten daher nur auf Stream-Ebene.
+
+    Gibt ein Bericht-Dict zurück (Stream-Bytes vorher/nachher, Zeit, Anzahl).
+    """
+    report = {
+        "profile": profile,
+        "streams": 0,
+        "compressed": 0,
+        "duplicates": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "seconds": 0.0,
+    }
+    if profile == "fast":
+        return report
+
+    start = time.perf_counter()
+    for index, obj in enumerate(writer._objects):
+        if not isinstance(obj, StreamObject):
+            continue
+        report["streams"] += 1
+        report["bytes_before"] += len(obj._data)
+
+        encoded = _compress_stream(obj, profile)
+        if encoded is not None:
+            writer._objects[index] = encoded
+            report["compressed"] += 1
+
+    if profile == "smallest":
+        report["duplicates"] = _deduplicate_streams(writer)
+
+    report["bytes_after"] = sum(
+        len(obj._data) for obj in writer._objects if isinstance(obj, StreamObject)
+    )
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def format_compression_report(fmt, report):
+    return (
+        f"{fmt}: Profil {report['profile']}, {report['compressed']}/{report['streams']} "
+        f"Stream(s) gepackt, {report['duplicates']} Duplikat(e) entfernt, "
+        f"Streams {report['bytes_before'] / 1e6:.2f} MB → {report['bytes_after'] / 1e6:.2f} MB, "
+        f"Datei {report.get('file_bytes', 0) / 1e6:.2f} MB, "
+        f"Packen {report['seconds']:.2f} s, Schreiben {report.get('write_seconds', 0.0):.2f} s"
+    )
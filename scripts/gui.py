@@ -1,20 +1,51 @@
+import logging
 import os
 import platform
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 
-from .sort import collect_pages_by_size, write_imposed_pdfs
 from .config import load_config, save_config
+from .progress import ProgressModel, format_eta
+from .logsink import level_tag, setup_logging
+
+logger = logging.getLogger(__name__)
 
 WINDOWS = platform.system() == "Windows"
 
-print_module = None
-if WINDOWS:
-    try:
-        from . import print as print_module
-    except Exception as e:
-        print("Could not import print module:", e)
-        print_module = None
+LOG_DRAIN_INTERVAL_MS = 100
+LOG_BATCH_SIZE = 500
+LOG_MAX_LINES = 2000
+
+# Limits pro Quelldatei (config.json: "file_timeout", "file_memory_limit_mb")
+DEFAULT_FILE_TIMEOUT = 120
+DEFAULT_FILE_MEMORY_LIMIT_MB = 2048
+
+# PyPDF2 (über .sort) und pywin32 (über .print) werden erst bei Bedarf
+# geladen, damit das Fenster ohne sie erscheint.
+_print_module = None
+_print_module_failed = False
+
+
+def get_print_module():
+    """
+    Lädt das Windows-Druckmodul beim ersten Aufruf. Gibt None zurück, wenn
+    Drucken auf diesem System nicht verfügbar ist.
+    """
+    global _print_module, _print_module_failed
+
+    if not WINDOWS or _print_module_failed:
+        return None
+    if _print_module is None:
+        try:
+            from . import print as module
+        except Exception as e:
+            logger.warning("Could not import print module: %s", e)
+            _print_module_failed = True
+            return None
+        _print_module = module
+    return _print_module
 
 
 class PdfSortPrintGUI:
@@ -25,6 +56,19 @@ class PdfSortPrintGUI:
         # Konfiguration laden
         self.config = load_config()
 
+        # Log-Meldungen kommen über das logging-Modul und eine Queue,
+        # die GUI holt sie gesammelt per root.after ab.
+        self._log_queue = setup_logging(log_to_file=bool(self.config.get("log_to_file")))
+
+        # Ereignisse aus dem Hintergrund-Thread (Fortschritt, Ergebnis)
+        self._events = queue.Queue()
+        self._job_running = False
+
+        # Druckerliste wird im Hintergrund geladen
+        self._printer_queue = queue.Queue()
+        self._printers_loaded = False
+        self._print_available = False
+
         self.root.geometry("900x520")
         self.root.minsize(800, 420)
 
@@ -33,6 +77,8 @@ class PdfSortPrintGUI:
         self._center_window()
 
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
+        self._start_printer_loading()
 
     # ---------------------------------------------------------
     # Styling / Layout
@@ -98,7 +144,7 @@ class PdfSortPrintGUI:
         )
         status_label.grid(row=0, column=0, sticky="ew")
 
-        self.progress = ttk.Progressbar(status_frame, mode="indeterminate", length=160)
+        self.progress = ttk.Progressbar(status_frame, mode="determinate", length=160, maximum=1.0)
         self.progress.grid(row=0, column=1, padx=(0, 10), pady=4, sticky="e")
 
     def _center_window(self):
@@ -120,7 +166,10 @@ class PdfSortPrintGUI:
         frame.grid(row=0, column=0, padx=(0, 8), pady=4, sticky="nsew")
         frame.columnconfigure(1, weight=1)
 
-        self.printer_values = self._load_printer_values()
+        if WINDOWS:
+            self.printer_values = ["[Drucker werden geladen …]"]
+        else:
+            self.printer_values = ["[Windows-Drucker nicht verfügbar]"]
         self.printer_combos = {}
 
         cfg_printers = self.config.get("printers") or {}
@@ -147,30 +196,69 @@ class PdfSortPrintGUI:
             self.printer_combos[fmt] = combo
             row += 1
 
+        self.printer_info_label = ttk.Label(
+            frame,
+            text="",
+            style="SubHeader.TLabel",
+            wraplength=260,
+        )
+        self.printer_info_label.grid(row=row, column=0, columnspan=2, padx=6, pady=(4, 2), sticky="w")
+        self._update_printer_info()
+
+    def _update_printer_info(self):
         info_text = ""
-        if not WINDOWS or print_module is None:
+        if not WINDOWS or (self._printers_loaded and not self._print_available):
             info_text = "Drucken ist nur unter Windows mit eingerichtetem Drucker verfügbar."
         elif self.printer_values and self.printer_values[0].startswith("["):
             info_text = self.printer_values[0]
+        self.printer_info_label.config(text=info_text)
 
-        if info_text:
-            info_label = ttk.Label(
-                frame,
-                text=info_text,
-                style="SubHeader.TLabel",
-                wraplength=260,
-            )
-            info_label.grid(row=row, column=0, columnspan=2, padx=6, pady=(4, 2), sticky="w")
+    def _start_printer_loading(self):
+        if not WINDOWS:
+            self._printers_loaded = True
+            return
+
+        def worker():
+            available = get_print_module() is not None
+            self._printer_queue.put((available, self._load_printer_values()))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(100, self._poll_printers)
+
+    def _poll_printers(self):
+        try:
+            available, values = self._printer_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self._poll_printers)
+            return
+
+        self.printer_values = values
+        self._printers_loaded = True
+        self._print_available = available
+
+        cfg_printers = self.config.get("printers") or {}
+        for fmt, combo in self.printer_combos.items():
+            combo.configure(values=values)
+            saved = cfg_printers.get(fmt)
+            if saved and saved in values:
+                combo.set(saved)
+            elif values:
+                combo.current(0)
+
+        self._update_printer_info()
+        if not self._job_running:
+            self._set_buttons_enabled(True)
 
     def _load_printer_values(self):
-        if WINDOWS and print_module is not None:
+        print_module = get_print_module()
+        if print_module is not None:
             try:
                 printers = print_module.get_installed_printers()
                 if not printers:
                     return ["[Keine Drucker gefunden]"]
                 return printers
             except Exception as e:
-                print("Error getting printers:", e)
+                logger.warning("Fehler beim Laden der Drucker: %s", e)
                 return ["[Fehler beim Laden der Drucker]"]
         else:
             return ["[Windows-Drucker nicht verfügbar]"]
@@ -213,9 +301,17 @@ class PdfSortPrintGUI:
             text="Log anzeigen ▾",
             command=self._toggle_log,
         )
-        self.log_toggle_btn.grid(row=2, column=1, columnspan=2,
+        self.log_toggle_btn.grid(row=2, column=2,
                                  padx=6, pady=(6, 2), sticky="e")
 
+        # Anhängen statt neu schreiben (inkrementelles PDF-Update)
+        self.append_var = tk.BooleanVar(value=bool(self.config.get("append_output", False)))
+        ttk.Checkbutton(
+            frame,
+            text="An vorhandene Ausgabe-PDFs anhängen",
+            variable=self.append_var,
+        ).grid(row=2, column=1, padx=6, pady=(6, 2), sticky="w")
+
         # Log Widgets (anfangs versteckt)
         self.log_label = ttk.Label(frame, text="Protokoll:")
 
@@ -235,10 +331,10 @@ class PdfSortPrintGUI:
         btn_frame.grid(row=4, column=0, columnspan=3, pady=(8, 8), sticky="e")
         btn_frame.columnconfigure(0, weight=1)
 
-        btn_sort = ttk.Button(btn_frame, text="Nur sortieren", command=self.on_sort_only_clicked)
+        self.btn_sort = btn_sort = ttk.Button(btn_frame, text="Nur sortieren", command=self.on_sort_only_clicked)
         btn_sort.grid(row=0, column=0, padx=(0, 8))
 
-        btn_print = ttk.Button(
+        self.btn_print = btn_print = ttk.Button(
             btn_frame,
             text="Sortieren & drucken",
             style="Accent.TButton",
@@ -246,8 +342,8 @@ class PdfSortPrintGUI:
         )
         btn_print.grid(row=0, column=1)
 
-        if not WINDOWS or print_module is None:
-            btn_print.state(["disabled"])
+        # Wird freigegeben, sobald die Druckerliste geladen ist
+        btn_print.state(["disabled"])
 
         self._log("Bereit.")
 
@@ -293,39 +389,168 @@ class PdfSortPrintGUI:
             self._log(f"Zielordner gesetzt: {path}")
 
     # ---------------------------------------------------------
-    # Nur sortieren
+    # Hintergrund-Job: Vorab-Zählung, Sortieren, Montieren
     # ---------------------------------------------------------
 
-    def on_sort_only_clicked(self):
-        source, target = self._validate_paths()
-        if not source:
+    def _start_job(self, source, target, on_done):
+        if self._job_running:
             return
 
-        self._set_status("Seiten werden sortiert und montiert …")
-        self._log(f"Starte »Nur sortieren« von '{source}' nach '{target}'")
+        self._job_running = True
+        self._set_buttons_enabled(False)
         self._start_progress()
-        self.root.update_idletasks()
 
+        worker = threading.Thread(
+            target=self._run_job,
+            args=(source, target, self.append_var.get()),
+            daemon=True,
+        )
+        self._on_job_done = on_done
+        worker.start()
+        self.root.after(50, self._poll_events)
+
+    def _run_job(self, source, target, append):
+        """
+        Läuft im Hintergrund-Thread. Greift nicht auf Tk-Widgets zu:
+        Fortschritt und Ergebnis gehen über self._events, Meldungen über
+        das logging-Modul.
+        """
         try:
-            pages_by_size = collect_pages_by_size(source)
-            self._log("Seiten nach Format gesammelt.")
-            output_files = write_imposed_pdfs(pages_by_size, target)
-            self._log(f"Ausgabe-PDFs erstellt: {output_files}")
+            from .isolation import IsolatedPool
+            from .sort import (
+                collect_pages_by_size,
+                default_worker_count,
+                prescan_directory,
+                write_imposed_pdfs,
+                write_quarantine,
+            )
+
+            workers = int(self.config.get("workers") or default_worker_count())
+            quarantine = []
+
+            # Jede Datei wird in einem eigenen Prozess mit Zeit- und
+            # Speicherlimit gelesen; kaputte PDFs halten den Rest nicht auf.
+            with IsolatedPool(
+                workers=workers,
+                timeout=float(self.config.get("file_timeout", DEFAULT_FILE_TIMEOUT)),
+                memory_limit_mb=self.config.get("file_memory_limit_mb", DEFAULT_FILE_MEMORY_LIMIT_MB),
+            ) as pool:
+                estimate = prescan_directory(source, pool=pool)
+                logger.info(
+                    "Vorab-Zählung: %d Datei(en), ca. %d Seite(n), Bögen je Format: %s",
+                    estimate["files"], estimate["pages"], estimate["sheets_by_format"],
+                )
+
+                progress = ProgressModel(
+                    estimate,
+                    callback=lambda event: self._events.put(("progress", event)),
+                )
+                pages_by_size = collect_pages_by_size(
+                    source,
+                    progress=progress,
+                    pool=pool,
+                    known_failures=estimate["failed"],
+                    quarantine=quarantine,
+                )
+            logger.info("Seiten nach Format gesammelt.")
+
+            if quarantine:
+                reasons_path = write_quarantine(quarantine, os.path.join(target, "quarantaene"))
+                logger.warning("Übersprungene Dateien und Gründe: %s", reasons_path)
+
+            output_files = write_imposed_pdfs(
+                pages_by_size,
+                target,
+                progress=progress,
+                workers=workers,
+                append=append,
+                image_options=self.config.get("image_optimisation") or None,
+                compression=self.config.get("output_compression") or None,
+            )
+            progress.finish()
         except Exception as e:
-            self._stop_progress()
+            self._events.put(("error", e))
+            return
+
+        self._events.put(("done", output_files, quarantine))
+
+    def _poll_events(self):
+        latest_progress = None
+        finished = None
+
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            kind = event[0]
+            if kind == "progress":
+                # Nur der jüngste Stand wird angezeigt
+                latest_progress = event[1]
+            else:
+                finished = event
+
+        if latest_progress is not None:
+            self._show_progress(latest_progress)
+
+        if finished is None:
+            self.root.after(50, self._poll_events)
+            return
+
+        self._job_running = False
+        self._set_buttons_enabled(True)
+
+        if finished[0] == "error":
+            e = finished[1]
+            self._start_progress()
             self._set_status("Fehler beim Sortieren.")
             self._log(f"Fehler beim Erstellen der Ausgabe-PDFs: {e}", level="ERROR")
             messagebox.showerror("Fehler", f"Fehler beim Erstellen der Ausgabe-PDFs:\n{e}")
             return
 
         self._stop_progress()
+        output_files = finished[1]
+        self._skipped_files = finished[2]
+        self._log(f"Ausgabe-PDFs erstellt: {output_files}")
 
         if not output_files:
             self._set_status("Keine Seiten zu verarbeiten.")
             self._log("Keine Seiten gefunden, die verarbeitet werden können.", level="WARN")
-            messagebox.showinfo("Info", "Keine Seiten gefunden, die verarbeitet werden können.")
+            messagebox.showinfo(
+                "Info",
+                "Keine Seiten gefunden, die verarbeitet werden können." + self._skipped_note(),
+            )
             return
 
+        self._on_job_done(output_files)
+
+    def _show_progress(self, event):
+        self.progress.configure(value=event["fraction"])
+
+        if event["phase"] == "scan":
+            phase, unit = "Seiten lesen", "Seiten/s"
+        else:
+            phase, unit = "Bögen erzeugen", "Bögen/s"
+        self._set_status(
+            f"{phase}: {event['done']}/{event['total']} · "
+            f"{event['rate']:.1f} {unit} · Restzeit {format_eta(event['eta'])}"
+        )
+
+    # ---------------------------------------------------------
+    # Nur sortieren
+    # ---------------------------------------------------------
+
+    def on_sort_only_clicked(self):
+        source, target = self._validate_paths()
+        if not source:
+            return
+
+        self._set_status("Seiten werden gezählt …")
+        self._log(f"Starte »Nur sortieren« von '{source}' nach '{target}'")
+        self._start_job(source, target, self._finish_sort_only)
+
+    def _finish_sort_only(self, output_files):
         self._save_current_config()
 
         self._set_status("Sortieren abgeschlossen (kein Druck).")
@@ -333,6 +558,7 @@ class PdfSortPrintGUI:
         messagebox.showinfo(
             "Nur sortieren",
             "Ausgabe-PDFs wurden erfolgreich erstellt.\nEs wurde nichts gedruckt."
+            + self._skipped_note()
         )
 
     # ---------------------------------------------------------
@@ -344,41 +570,26 @@ class PdfSortPrintGUI:
         if not source:
             return
 
-        self._set_status("Seiten werden sortiert und montiert …")
+        self._set_status("Seiten werden gezählt …")
         self._log(f"Starte »Sortieren & drucken« von '{source}' nach '{target}'")
-        self._start_progress()
-        self.root.update_idletasks()
-
-        try:
-            pages_by_size = collect_pages_by_size(source)
-            self._log("Seiten nach Format gesammelt.")
-            output_files = write_imposed_pdfs(pages_by_size, target)
-            self._log(f"Ausgabe-PDFs erstellt: {output_files}")
-        except Exception as e:
-            self._stop_progress()
-            self._set_status("Fehler beim Sortieren.")
-            self._log(f"Fehler beim Erstellen der Ausgabe-PDFs: {e}", level="ERROR")
-            messagebox.showerror("Fehler", f"Fehler beim Erstellen der Ausgabe-PDFs:\n{e}")
-            return
-
-        if not output_files:
-            self._stop_progress()
-            self._set_status("Keine Seiten zu verarbeiten.")
-            self._log("Keine Seiten gefunden, die verarbeitet werden können.", level="WARN")
-            messagebox.showinfo("Info", "Keine Seiten gefunden, die verarbeitet werden können.")
-            return
+        self._start_job(source, target, self._finish_print)
 
+    def _finish_print(self, output_files):
         printer_settings = self._build_printer_settings()
         self._log(f"Drucker-Einstellungen: {printer_settings}")
 
-        if WINDOWS and print_module is not None and printer_settings:
+        print_module = get_print_module()
+        if print_module is not None and printer_settings:
             self._set_status("Druckaufträge werden gesendet …")
             self.root.update_idletasks()
             try:
                 print_module.print_selected_formats(output_files, printer_settings)
                 self._set_status("Druckaufträge gesendet.")
                 self._log("Druckaufträge erfolgreich gesendet.")
-                messagebox.showinfo("Fertig", "Ausgabe-PDFs wurden erstellt und an die Drucker gesendet.")
+                messagebox.showinfo(
+                    "Fertig",
+                    "Ausgabe-PDFs wurden erstellt und an die Drucker gesendet." + self._skipped_note(),
+                )
             except Exception as e:
                 self._set_status("Fehler beim Drucken.")
                 self._log(f"Fehler beim Drucken: {e}", level="ERROR")
@@ -390,9 +601,9 @@ class PdfSortPrintGUI:
                 "Info",
                 "Ausgabe-PDFs wurden erfolgreich erstellt.\n"
                 "Drucken ist nur unter Windows mit eingerichtetem Drucker verfügbar."
+                + self._skipped_note()
             )
 
-        self._stop_progress()
         self._save_current_config()
 
     # ---------------------------------------------------------
@@ -400,20 +611,32 @@ class PdfSortPrintGUI:
     # ---------------------------------------------------------
 
     def _save_current_config(self):
-        printers = {}
-        for fmt, combo in self.printer_combos.items():
-            val = combo.get()
-            if val and not val.startswith("["):
-                printers[fmt] = val
-
-        cfg = {
+        if not self._printers_loaded:
+            # Noch keine Druckerliste: gespeicherte Auswahl nicht verwerfen
+            printers = dict(self.config.get("printers") or {})
+        else:
+            printers = {}
+            for fmt, combo in self.printer_combos.items():
+                val = combo.get()
+                if val and not val.startswith("["):
+                    printers[fmt] = val
+
+        # Unbekannte Schlüssel (z. B. "log_to_file") bleiben erhalten
+        cfg = dict(self.config)
+        cfg.update({
             "printers": printers,
             "last_source": self.source_var.get().strip(),
             "last_target": self.target_var.get().strip(),
-        }
+            "append_output": bool(self.append_var.get()),
+        })
         save_config(cfg)
 
     def _on_close(self):
+        if self._job_running and not messagebox.askyesno(
+            "Beenden",
+            "Es läuft noch ein Auftrag. Trotzdem beenden?",
+        ):
+            return
         try:
             self._save_current_config()
         finally:
@@ -457,34 +680,79 @@ class PdfSortPrintGUI:
 
         return settings
 
+    def _skipped_note(self):
+        skipped = getattr(self, "_skipped_files", None)
+        if not skipped:
+            return ""
+        return (
+            f"\n\n{len(skipped)} Datei(en) konnten nicht gelesen werden und wurden "
+            "übersprungen (Kopie und Gründe im Ordner »quarantaene«, Details im Log)."
+        )
+
     def _set_status(self, text: str):
         self.status_var.set(text)
 
+    def _set_buttons_enabled(self, enabled: bool):
+        self.btn_sort.state(["!disabled"] if enabled else ["disabled"])
+        if self._print_available:
+            self.btn_print.state(["!disabled"] if enabled else ["disabled"])
+
     def _start_progress(self):
         try:
-            self.progress.start(10)
+            self.progress.configure(value=0.0)
         except tk.TclError:
             pass
 
     def _stop_progress(self):
         try:
-            self.progress.stop()
+            self.progress.configure(value=self.progress.cget("maximum"))
         except tk.TclError:
             pass
 
     def _log(self, message: str, level: str = "INFO"):
         level = level.upper()
-        if level not in ("INFO", "ERROR", "WARN"):
-            level = "INFO"
-
-        if not hasattr(self, "log_text"):
-            return
+        levelno = {"ERROR": logging.ERROR, "WARN": logging.WARNING}.get(level, logging.INFO)
+        logger.log(levelno, message)
 
-        prefix = f"[{level}] "
-        self.log_text.configure(state="normal")
-        self.log_text.insert("end", prefix + message + "\n", level)
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+    def _drain_log(self):
+        """
+        Holt höchstens LOG_BATCH_SIZE Meldungen aus der Log-Queue und fügt sie
+        in einem Rutsch ein. Das Widget behält nur die letzten
+        LOG_MAX_LINES Zeilen, ältere werden vorne abgeschnitten.
+        """
+        batch = []
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                record = self._log_queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(record)
+
+        if batch and hasattr(self, "log_text"):
+            # Aufeinanderfolgende Zeilen mit gleichem Level zusammenfassen
+            chunks = []
+            for record in batch:
+                tag = level_tag(record.levelno)
+                line = f"[{tag}] {record.getMessage()}\n"
+                if chunks and chunks[-1][0] == tag:
+                    chunks[-1][1].append(line)
+                else:
+                    chunks.append((tag, [line]))
+
+            self.log_text.configure(state="normal")
+            for tag, lines in chunks:
+                self.log_text.insert("end", "".join(lines), tag)
+
+            line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_MAX_LINES:
+                self.log_text.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+
+            self.log_text.see("end")
+            self.log_text.configure(state="disabled")
+
+        # Bei vollem Stapel sofort weitermachen, sonst im normalen Takt
+        delay = 1 if len(batch) == LOG_BATCH_SIZE else LOG_DRAIN_INTERVAL_MS
+        self.root.after(delay, self._drain_log)
 
 
 def main():
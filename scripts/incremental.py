@@ -0,0 +1,287 @@
+import re
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+)
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+
+
+def _find_startxref(path):
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(max(0, size - 1024))
+        tail = f.read()
+
+    match = _STARTXREF_RE.search(tail)
+    if match is None:
+        raise ValueError(f"No startxref found in {path}")
+    return int(match.group(1)), size, tail.endswith(b"\n")
+
+
+def _is_page(obj):
+    return isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page"
+
+
+def _children(obj):
+    if isinstance(obj, DictionaryObject):
+        skip_parent = _is_page(obj)
+        for key, value in obj.items():
+            if skip_parent and key == "/Parent":
+                continue
+            yield value
+    elif isinstance(obj, ArrayObject):
+        yield from obj
+
+
+def _collect_objects(update, page_refs):
+    # All objects reachable from the new pages, except the page tree itself.
+    order = []
+    seen = set()
+    stack = list(reversed(page_refs))
+    while stack:
+        ref = stack.pop()
+        if ref.idnum in seen:
+            continue
+        seen.add(ref.idnum)
+        obj = update.get_object(ref)
+        order.append((ref.idnum, obj))
+
+        direct = [obj]
+        while direct:
+            for child in _children(direct.pop()):
+                if isinstance(child, IndirectObject):
+                    if child.idnum not in seen:
+                        stack.append(child)
+                else:
+                    direct.append(child)
+    return order
+
+
+def _renumber(obj, numbers, parent_ref):
+    is_page = _is_page(obj)
+    if isinstance(obj, DictionaryObject):
+        items = list(obj.items())
+    elif isinstance(obj, ArrayObject):
+        items = list(enumerate(obj))
+    else:
+        return
+
+    for key, value in items:
+        if is_page and key == "/Parent":
+            obj[key] = parent_ref
+        elif isinstance(value, IndirectObject):
+            obj[key] = IndirectObject(numbers[value.idnum], 0, None)
+        else:
+            _renumber(value, numbers, parent_ref)
+
+
+def _resolve(value, new_objects):
+    # Verweise der neuen Objekte sind schon umnummeriert (pdf None), die
+    # der vorhandenen Datei zeigen noch auf deren Reader.
+    if isinstance(value, IndirectObject):
+        if value.pdf is None:
+            return new_objects[value.idnum]
+        return value.get_object()
+    return value
+
+
+def _as_list(value, new_objects):
+    if value is None:
+        return []
+    resolved = _resolve(value, new_objects)
+    if isinstance(resolved, ArrayObject):
+        return list(resolved)
+    return [value]
+
+
+def _fill_page(base_page, page, new_objects):
+    # Legt die neue Seite auf eine vorhandene: deren Einträge bleiben mit
+    # ihren Objektnummern stehen, Inhalt und Annotationen werden ergänzt,
+    # die Ressourcen je Kategorie zusammengeführt. Beide Inhalte stellen
+    # ihren Grafikzustand selbst wieder her (q ... Q je Slot).
+    filled = DictionaryObject()
+    for key, value in base_page.items():
+        filled[key] = value
+
+    filled[NameObject("/Contents")] = ArrayObject(
+        _as_list(base_page.raw_get("/Contents") if "/Contents" in base_page else None, new_objects)
+        + _as_list(page.raw_get("/Contents") if "/Contents" in page else None, new_objects)
+    )
+
+    resources = DictionaryObject()
+    if "/Resources" in base_page:
+        for key, value in _resolve(base_page.raw_get("/Resources"), new_objects).items():
+            resources[key] = value
+    if "/Resources" in page:
+        for key, value in _resolve(page.raw_get("/Resources"), new_objects).items():
+            if key not in resources:
+                resources[key] = value
+                continue
+            existing = _resolve(resources[key], new_objects)
+            added = _resolve(value, new_objects)
+            if not isinstance(existing, DictionaryObject) or not isinstance(added, DictionaryObject):
+                continue
+            combined = DictionaryObject()
+            combined.update(existing)
+            for name, entry in added.items():
+                if name in combined:
+                    raise ValueError(f"Resource {key} {name} is already used on the filled page")
+                combined[name] = entry
+            resources[key] = combined
+    filled[NameObject("/Resources")] = resources
+
+    annots = (
+        _as_list(base_page.raw_get("/Annots") if "/Annots" in base_page else None, new_objects)
+        + _as_list(page.raw_get("/Annots") if "/Annots" in page else None, new_objects)
+    )
+    if annots:
+        filled[NameObject("/Annots")] = ArrayObject(annots)
+    return filled
+
+
+def _write_object(out, idnum, generation, obj):
+    out.write(f"{idnum} {generation} obj\n".encode("ascii"))
+    obj.write_to_stream(out, None)
+    out.write(b"\nendobj\n")
+
+
+def _write_xref(out, offsets):
+    out.write(b"xref\n")
+    numbers = sorted(offsets)
+    start = 0
+    while start < len(numbers):
+        end = start
+        while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+            end += 1
+        out.write(f"{numbers[start]} {end - start + 1}\n".encode("ascii"))
+        for idnum in numbers[start:end + 1]:
+            offset, generation = offsets[idnum]
+            out.write(f"{offset:010d} {generation:05d} n\r\n".encode("ascii"))
+        start = end + 1
+
+
+def append_pages_incremental(path, writer, fill_page_ref=None):
+    """
+    Hängt die Seiten von writer als inkrementelles Update an die PDF path an.
+    Die vorhandenen Bytes bleiben unverändert; angehängt werden nur die neuen
+    Objekte, der erweiterte Seitenbaum, eine Xref-Sektion und ein Trailer
+    mit /Prev. Die vorhandene Datei wird nur über Xref, Trailer und den
+    Wurzel-Seitenknoten gelesen, nicht komplett geladen. Neu geschrieben
+    werden außer den neuen Seiten nur der Wurzel-Seitenknoten (/Kids mit
+    einem Verweis je vorhandener Seite).
+
+    fill_page_ref: (Objektnummer, Generation) einer vorhandenen Seite, z. B.
+    eines halb belegten Bogens, auf die die erste Seite aus writer gelegt
+    wird. Die Seite wird unter derselben Objektnummer neu geschrieben und
+    verweist weiter auf ihre vorhandenen Inhalte und Ressourcen; nur die
+    hinzukommenden werden geschrieben.
+
+    Gibt (Seitenzahl nach dem Update, [(Objektnummer, Generation) der
+    neuen Seiten]) zurück.
+
+    Hinweis: Es wird eine klassische Xref-Tabelle geschrieben. Das passt zu
+    den Ausgaben von PdfWriter; verschlüsselte Dateien werden nicht
+    unterstützt.
+    """
+    prev_xref, file_size, ends_with_newline = _find_startxref(path)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    update = PdfReader(buffer)
+
+    page_refs = [page.indirect_reference for page in update.pages]
+
+    with open(path, "rb") as f:
+        base = PdfReader(f)
+        if base.is_encrypted:
+            raise ValueError(f"Cannot append to encrypted PDF: {path}")
+
+        root_ref = base.trailer.raw_get("/Root")
+        pages_ref = root_ref.get_object().raw_get("/Pages")
+        pages_node = pages_ref.get_object()
+        page_count = int(pages_node["/Count"])
+        if not page_refs:
+            return page_count, []
+
+        objects = _collect_objects(update, page_refs)
+
+        next_number = int(base.trailer["/Size"])
+        numbers = {}
+        generations = {}
+        filled = None
+        if fill_page_ref is not None:
+            filled_idnum, filled_generation = fill_page_ref
+            filled = IndirectObject(filled_idnum, filled_generation, base).get_object()
+            if not _is_page(filled):
+                raise ValueError(f"Object {filled_idnum} in {path} is not a page")
+            numbers[page_refs[0].idnum] = filled_idnum
+            generations[filled_idnum] = filled_generation
+
+        for idnum, _ in objects:
+            if idnum not in numbers:
+                numbers[idnum] = next_number
+                next_number += 1
+
+        parent_ref = IndirectObject(pages_ref.idnum, pages_ref.generation, None)
+        for _, obj in objects:
+            _renumber(obj, numbers, parent_ref)
+        if filled is not None:
+            # Der gefüllte Bogen bleibt an seiner Stelle im Seitenbaum
+            new_objects = {numbers[idnum]: obj for idnum, obj in objects}
+            objects[0] = (objects[0][0], _fill_page(filled, objects[0][1], new_objects))
+
+        # Neue Fassung des Wurzel-Seitenknotens mit den zusätzlichen Seiten
+        added = [
+            IndirectObject(numbers[ref.idnum], 0, None)
+            for ref in page_refs
+            if fill_page_ref is None or ref is not page_refs[0]
+        ]
+        new_pages_node = DictionaryObject()
+        for key, value in pages_node.items():
+            new_pages_node[key] = value
+        new_pages_node[NameObject("/Kids")] = ArrayObject(list(pages_node["/Kids"]) + added)
+        new_pages_node[NameObject("/Count")] = NumberObject(page_count + len(added))
+
+        trailer = DictionaryObject()
+        trailer[NameObject("/Size")] = NumberObject(next_number)
+        trailer[NameObject("/Root")] = root_ref
+        trailer[NameObject("/Prev")] = NumberObject(prev_xref)
+        for key in ("/Info", "/ID"):
+            if key in base.trailer:
+                trailer[NameObject(key)] = base.trailer.raw_get(key)
+
+    out = BytesIO()
+    if not ends_with_newline:
+        out.write(b"\n")
+
+    offsets = {}
+    for idnum, obj in objects:
+        number = numbers[idnum]
+        generation = generations.get(number, 0)
+        offsets[number] = (file_size + out.tell(), generation)
+        _write_object(out, number, generation, obj)
+
+    offsets[pages_ref.idnum] = (file_size + out.tell(), pages_ref.generation)
+    _write_object(out, pages_ref.idnum, pages_ref.generation, new_pages_node)
+
+    xref_offset = file_size + out.tell()
+    _write_xref(out, offsets)
+
+    out.write(b"trailer\n")
+    trailer.write_to_stream(out, None)
+    out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii"))
+
+    with open(path, "ab") as f:
+        f.write(out.getvalue())
+
+    new_refs = [(numbers[ref.idnum], generations.get(numbers[ref.idnum], 0)) for ref in page_refs]
+    return int(new_pages_node["/Count"]), new_refs
@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+# Hält das Job-Objekt (Windows) im Worker am Leben
+_job_handle = None
+
+
+def _apply_memory_limit(limit_mb):
+    global _job_handle
+
+    if not limit_mb:
+        return
+    limit = int(limit_mb * 1024 * 1024)
+
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+        return
+
+    try:
+        import win32api
+        import win32job
+
+        job = win32job.CreateJobObject(None, "")
+        info = win32job.QueryInformationJobObject(
+            job, win32job.JobObjectExtendedLimitInformation
+        )
+        info["ProcessMemoryLimit"] = limit
+        info["BasicLimitInformation"]["LimitFlags"] |= win32job.JOB_OBJECT_LIMIT_PROCESS_MEMORY
+        win32job.SetInformationJobObject(
+            job, win32job.JobObjectExtendedLimitInformation, info
+        )
+        win32job.AssignProcessToJobObject(job, win32api.GetCurrentProcess())
+        _job_handle = job
+    except Exception:
+        pass
+
+
+def _worker_main(conn, memory_limit_mb):
+    _apply_memory_limit(memory_limit_mb)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        func, args = task
+        try:
+            result = ("ok", func(*args))
+        except MemoryError:
+            result = ("error", "Speicherlimit überschritten")
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send(("error", f"Ergebnis nicht übertragbar: {e}"))
+
+
+class _Worker:
+    def __init__(self, memory_limit_mb):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.task_index = None
+        self.started = None
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class IsolatedPool:
+    """
+    Prozess-Pool für Aufgaben, die hängen bleiben oder abstürzen können
+    (z. B. kaputte PDFs). Jede Aufgabe hat ein eigenes Zeitlimit; ein
+    Worker, der es überschreitet oder abstürzt, wird beendet und ersetzt,
+    die übrigen Aufgaben laufen weiter. Die Worker bleiben zwischen
+    map()-Aufrufen erhalten.
+
+    timeout: Sekunden pro Aufgabe (None = unbegrenzt)
+    memory_limit_mb: Adressraum-Limit pro Worker (POSIX: RLIMIT_AS,
+      Windows: Job-Objekt über pywin32, sonst ohne Limit)
+    """
+
+    def __init__(self, workers=None, timeout=None, memory_limit_mb=None):
+        self.size = max(1, workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def _spawn(self):
+        worker = _Worker(self.memory_limit_mb)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.kill()
+        self._workers.remove(worker)
+
+    def map(self, func, args_list):
+        """
+        Führt func(*args) für jedes Element aus und liefert
+        (index, ok, ergebnis_oder_grund) in Fertigstellungsreihenfolge.
+        """
+        pending = list(enumerate(args_list))
+        pending.reverse()
+        busy = []
+
+        while len(self._workers) < min(self.size, len(pending)):
+            self._spawn()
+
+        try:
+            yield from self._run(func, pending, busy)
+        finally:
+            # Abgebrochene Iteration: laufende Aufgaben verwerfen
+            for worker in busy:
+                if worker in self._workers:
+                    self._replace(worker)
+
+    def _run(self, func, pending, busy):
+        while pending or busy:
+            for worker in self._workers:
+                if not pending:
+                    break
+                if worker.task_index is None:
+                    index, args = pending.pop()
+                    worker.conn.send((func, args))
+                    worker.task_index = index
+                    worker.started = time.monotonic()
+                    busy.append(worker)
+
+            wait_timeout = None
+            if self.timeout is not None:
+                now = time.monotonic()
+                wait_timeout = max(0.0, min(w.started + self.timeout - now for w in busy))
+
+            handles = [w.conn for w in busy] + [w.process.sentinel for w in busy]
+            ready = wait(handles, timeout=wait_timeout)
+
+            for worker in list(busy):
+                index = worker.task_index
+                outcome = None
+
+                if worker.conn in ready:
+                    try:
+                        status, value = worker.conn.recv()
+                        outcome = (status == "ok", value)
+                    except (EOFError, OSError):
+                        outcome = None
+
+                if outcome is None and (
+                    worker.conn in ready or worker.process.sentinel in ready
+                ):
+                    worker.process.join(1)
+                    outcome = (False, f"Worker abgebrochen (Exit-Code {worker.process.exitcode})")
+                    self._replace(worker)
+                elif outcome is None and self.timeout is not None and (
+                    time.monotonic() - worker.started >= self.timeout
+                ):
+                    outcome = (False, f"Zeitüberschreitung nach {self.timeout:g} s")
+                    self._replace(worker)
+
+                if outcome is None:
+                    continue
+
+                busy.remove(worker)
+                worker.task_index = None
+                if pending and worker not in self._workers:
+                    self._spawn()
+                yield index, outcome[0], outcome[1]
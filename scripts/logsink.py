@@ -0,0 +1,60 @@
+import logging
+import logging.handlers
+import queue
+
+from .config import get_config_dir
+
+LOGGER_NAME = __package__ or "scripts"
+
+LOG_FILE_NAME = "hm-druck.log"
+LOG_FILE_MAX_BYTES = 1_000_000
+LOG_FILE_BACKUPS = 3
+
+
+def get_log_file_path():
+    return get_config_dir() / LOG_FILE_NAME
+
+
+def setup_logging(log_to_file=False):
+    """
+    Richtet das Paket-Logging ein und gibt die Queue zurück, aus der die GUI
+    die Meldungen gesammelt abholt. Der QueueHandler ist thread-sicher, die
+    Pipeline darf also aus Hintergrund-Threads loggen.
+
+    log_to_file: zusätzlich rotierende Log-Datei im Konfigurationsordner.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    if log_to_file:
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                get_log_file_path(),
+                maxBytes=LOG_FILE_MAX_BYTES,
+                backupCount=LOG_FILE_BACKUPS,
+                encoding="utf-8",
+            )
+        except OSError:
+            file_handler = None
+        if file_handler is not None:
+            file_handler.setFormatter(
+                logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+            )
+            logger.addHandler(file_handler)
+
+    return log_queue
+
+
+def level_tag(levelno):
+    if levelno >= logging.ERROR:
+        return "ERROR"
+    if levelno >= logging.WARNING:
+        return "WARN"
+    return "INFO"
@@ -0,0 +1,160 @@
+import time
+from collections import deque
+
+# Angenommene Kosten eines Bogens in gelesenen Seiten, solange die
+# Schreibphase noch keine eigene Rate hat (gemessen: etwa 3 bis 9)
+SHEET_COST_IN_PAGES = 8
+
+
+class ProgressModel:
+    """
+    Fortschritt über die Phasen "scan" (Seiten lesen) und "write"
+    (Bögen erzeugen) mit gleitender Rate und Restzeit-Schätzung.
+
+    Die Gesamtmenge stammt zunächst aus der Vorab-Zählung
+    (sort.prescan_directory) und wird mit start_phase() durch die echten
+    Werte ersetzt, sobald sie bekannt sind.
+
+    Seiten und Bögen sind unterschiedlich teuer: fraction und eta gewichten
+    jede Phase mit ihren Sekunden pro Einheit (laufende Phase: aktuelle
+    Rate, abgeschlossene: Mittelwert, kommende: SHEET_COST_IN_PAGES).
+
+    callback: wird bei jeder Änderung mit einem Event-Dict aufgerufen, z. B.
+      { "phase": "scan", "done": 120, "total": 800,
+        "overall_done": 120, "overall_total": 1210,
+        "fraction": 0.099, "rate": 85.3, "eta": 12.8 }
+    """
+
+    PHASES = ("scan", "write")
+
+    def __init__(self, estimate=None, callback=None, window=5.0):
+        estimate = estimate or {}
+        sheets = estimate.get("sheets_by_format") or {}
+
+        self.callback = callback
+        self.window = window
+
+        self.totals = {
+            "scan": int(estimate.get("pages", 0) or 0),
+            "write": int(sum(sheets.values())),
+        }
+        self.done = {phase: 0 for phase in self.PHASES}
+        self.phase = "scan"
+        # Sekunden pro Einheit abgeschlossener Phasen
+        self._unit_seconds = {}
+        self._phase_started = time.monotonic()
+        self._fraction = 0.0
+
+        self._samples = deque()
+        self._add_sample()
+
+    def start_phase(self, phase, total=None):
+        if phase not in self.PHASES:
+            raise ValueError(f"Unknown phase: {phase}")
+
+        # Vorherige Phasen gelten als abgeschlossen, damit die Gesamtsumme
+        # nicht an einer zu hoch geschätzten Seitenzahl hängen bleibt.
+        for previous in self.PHASES[:self.PHASES.index(phase)]:
+            self.totals[previous] = self.done[previous]
+
+        if phase != self.phase and self.done[self.phase]:
+            self._unit_seconds[self.phase] = (
+                (time.monotonic() - self._phase_started) / self.done[self.phase]
+            )
+        self._phase_started = time.monotonic()
+        self.phase = phase
+        if total is not None:
+            self.totals[phase] = int(total)
+
+        # Die Rate zählt Einheiten der laufenden Phase (Seiten bzw. Bögen)
+        self._samples.clear()
+        self._add_sample()
+        self._emit()
+
+    def advance(self, count=1):
+        self.done[self.phase] += count
+        if self.done[self.phase] > self.totals[self.phase]:
+            self.totals[self.phase] = self.done[self.phase]
+        self._add_sample()
+        self._emit()
+
+    def finish(self):
+        for phase in self.PHASES:
+            self.totals[phase] = self.done[phase]
+        self._emit()
+
+    def rate(self):
+        if len(self._samples) < 2:
+            return 0.0
+        t0, n0 = self._samples[0]
+        t1, n1 = self._samples[-1]
+        if t1 <= t0:
+            return 0.0
+        return (n1 - n0) / (t1 - t0)
+
+    def _costs(self, rate):
+        # Sekunden (oder, solange nichts gemessen ist, Seiten-Äquivalente)
+        # pro Einheit je Phase
+        costs = dict(self._unit_seconds)
+        if rate > 0:
+            costs[self.phase] = 1.0 / rate
+        if "scan" in costs and "write" not in costs:
+            costs["write"] = costs["scan"] * SHEET_COST_IN_PAGES
+        elif "write" in costs and "scan" not in costs:
+            costs["scan"] = costs["write"] / SHEET_COST_IN_PAGES
+        elif not costs:
+            costs = {"scan": 1.0, "write": float(SHEET_COST_IN_PAGES)}
+        return costs
+
+    def snapshot(self):
+        overall_done = sum(self.done.values())
+        overall_total = sum(self.totals.values())
+        rate = self.rate()
+        costs = self._costs(rate)
+
+        work_done = sum(self.done[phase] * costs[phase] for phase in self.PHASES)
+        work_total = sum(self.totals[phase] * costs[phase] for phase in self.PHASES)
+        if work_total:
+            # Neue Messwerte verschieben die Gewichte; der Balken soll
+            # dadurch nicht zurückspringen
+            self._fraction = max(self._fraction, min(work_done / work_total, 1.0))
+
+        eta = None
+        if rate > 0:
+            # Rest der laufenden Phase mit ihrer Rate, kommende Phasen mit
+            # ihren geschätzten Kosten
+            current = self.PHASES.index(self.phase)
+            eta = max(self.totals[self.phase] - self.done[self.phase], 0) / rate
+            eta += sum(self.totals[phase] * costs[phase] for phase in self.PHASES[current + 1:])
+
+        return {
+            "phase": self.phase,
+            "done": self.done[self.phase],
+            "total": self.totals[self.phase],
+            "overall_done": overall_done,
+            "overall_total": overall_total,
+            "fraction": self._fraction,
+            "rate": rate,
+            "eta": eta,
+        }
+
+    def _add_sample(self):
+        now = time.monotonic()
+        self._samples.append((now, self.done[self.phase]))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def _emit(self):
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "–"
+    seconds = int(round(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,615 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import socket
+import socketserver
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .config import get_config_dir, load_config
+from .isolation import IsolatedPool
+from .progress import ProgressModel
+from .sort import (
+    collect_pages_by_size,
+    default_worker_count,
+    prescan_directory,
+    write_imposed_pdfs,
+    write_quarantine,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CONCURRENCY = 2
+DEFAULT_MAX_QUEUED = 16
+DEFAULT_MAX_UPLOAD_MB = 512
+DEFAULT_KEEP_JOBS = 50
+DEFAULT_FILE_TIMEOUT = 120
+DEFAULT_FILE_MEMORY_LIMIT_MB = 2048
+
+# Einträge im Scan-Cache (Inhalts-Hash -> Seitenformate)
+SCAN_CACHE_SIZE = 10000
+
+# Vorschlag an Clients bei voller Warteschlange (Sekunden)
+RETRY_AFTER = 5
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class AdmissionError(Exception):
+    """Auftrag abgelehnt, weil die Warteschlange voll ist."""
+
+
+class _ScanCache(OrderedDict):
+    # Begrenzter LRU-Cache; wird von mehreren Auftrags-Threads benutzt.
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.size:
+                self.popitem(last=False)
+
+
+class Job:
+    def __init__(self, job_id, source, directory, uploaded):
+        self.id = job_id
+        self.source = source
+        self.directory = directory
+        self.uploaded = uploaded
+        self.output_directory = os.path.join(directory, "output")
+        # Uploads belegen ihren Platz in der Warteschlange schon, während
+        # die Daten noch ankommen
+        self.state = "receiving" if uploaded else "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = None
+        self.outputs = {}
+        self.quarantine = []
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": self.progress,
+            "outputs": {fmt: os.path.basename(path) for fmt, path in self.outputs.items()},
+            "skipped": [
+                {"file": os.path.basename(entry["path"]), "reason": entry["reason"]}
+                for entry in self.quarantine
+            ],
+            "error": self.error,
+        }
+
+
+class JobServer:
+    """
+    Nimmt Aufträge (Quellordner oder hochgeladene PDFs) an und arbeitet sie
+    mit höchstens `concurrency` gleichzeitig ab. Jeder Auftrags-Thread hält
+    einen eigenen IsolatedPool und einen Prozess-Pool für die parallele
+    Montage, deren Worker zwischen Aufträgen erhalten bleiben;
+    Scan-Ergebnisse und Bogen-Vorlagen bleiben zwischengespeichert.
+
+    Zulassung: Sind bereits `max_queued` Aufträge wartend (oder noch beim
+    Hochladen), wird ein neuer mit AdmissionError abgelehnt (HTTP 503).
+    allowed_roots: Quellordner müssen darunter liegen (leer = beliebig).
+    """
+
+    def __init__(self, work_dir, concurrency=DEFAULT_CONCURRENCY, max_queued=DEFAULT_MAX_QUEUED,
+                 workers=None, file_timeout=DEFAULT_FILE_TIMEOUT,
+                 file_memory_limit_mb=DEFAULT_FILE_MEMORY_LIMIT_MB,
+                 keep_jobs=DEFAULT_KEEP_JOBS, allowed_roots=None, image_options=None,
+                 compression=None):
+        self.work_dir = os.path.abspath(work_dir)
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max(1, max_queued)
+        # Die CPU-Kerne teilen sich die gleichzeitig laufenden Aufträge
+        self.workers = max(1, workers or default_worker_count() // self.concurrency)
+        self.file_timeout = file_timeout
+        self.file_memory_limit_mb = file_memory_limit_mb
+        self.keep_jobs = keep_jobs
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots or []]
+        self.image_options = image_options
+        self.compression = compression
+
+        self.scan_cache = _ScanCache(SCAN_CACHE_SIZE)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._jobs_done = 0
+
+        # Aufträge leben nur im Speicher; Reste eines früheren Laufs weg
+        self._jobs_dir = os.path.join(self.work_dir, "jobs")
+        shutil.rmtree(self._jobs_dir, ignore_errors=True)
+        os.makedirs(self._jobs_dir, exist_ok=True)
+
+    def start(self):
+        for n in range(self.concurrency):
+            thread = threading.Thread(target=self._runner, name=f"hm-druck-job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # --- Annahme ---------------------------------------------------------
+
+    def _admit(self, source=None):
+        # Zählen und Eintragen unter derselben Sperre, sonst können
+        # gleichzeitige Anfragen zusammen max_queued überschreiten.
+        with self._lock:
+            waiting = sum(
+                1 for job in self._jobs.values() if job.state in ("queued", "receiving")
+            )
+            if waiting >= self.max_queued:
+                raise AdmissionError(f"Warteschlange voll ({waiting} Aufträge wartend)")
+            job = self._new_job(source)
+            self._jobs[job.id] = job
+        return job
+
+    def _new_job(self, source=None):
+        job_id = uuid.uuid4().hex
+        directory = os.path.join(self._jobs_dir, job_id)
+        os.makedirs(directory)
+        uploaded = source is None
+        if uploaded:
+            source = os.path.join(directory, "input")
+            os.makedirs(source)
+        return Job(job_id, source, directory, uploaded)
+
+    def _enqueue(self, job):
+        with self._lock:
+            if self._jobs.get(job.id) is not job:
+                raise ValueError(f"Auftrag {job.id} wurde verworfen")
+            job.state = "queued"
+        self._queue.put(job)
+        logger.info("Auftrag %s angenommen (%s)", job.id, job.source)
+        return job
+
+    def submit_path(self, source):
+        source = os.path.realpath(source)
+        if not os.path.isdir(source):
+            raise ValueError(f"Quellordner nicht gefunden: {source}")
+        if self.allowed_roots and not any(
+            os.path.commonpath([source, root]) == root for root in self.allowed_roots
+        ):
+            raise PermissionError(f"Quellordner nicht freigegeben: {source}")
+
+        return self._enqueue(self._admit(source))
+
+    def submit_upload(self, filename, stream, length, max_bytes):
+        """
+        Nimmt eine einzelne PDF oder ein ZIP mit PDFs an. Aus ZIPs werden
+        nur *.pdf übernommen (ohne Pfadanteile).
+        """
+        job = self._admit()
+        try:
+            upload_path = os.path.join(job.directory, "upload")
+            with open(upload_path, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = stream.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        raise ValueError("Upload unvollständig")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+
+            if zipfile.is_zipfile(upload_path):
+                _extract_pdfs(upload_path, job.source, max_bytes)
+            else:
+                name = os.path.basename(filename or "upload.pdf")
+                if not name.lower().endswith(".pdf"):
+                    name += ".pdf"
+                os.replace(upload_path, os.path.join(job.source, name))
+            if os.path.exists(upload_path):
+                os.remove(upload_path)
+            if not os.listdir(job.source):
+                raise ValueError("Keine PDF im Upload")
+            return self._enqueue(job)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            shutil.rmtree(job.directory, ignore_errors=True)
+            raise
+
+    # --- Abfragen --------------------------------------------------------
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def output_path(self, job_id, name):
+        job = self.get(job_id)
+        if job is None or job.state != "done":
+            return None
+        for path in job.outputs.values():
+            if os.path.basename(path) == name:
+                return path
+        return None
+
+    def delete(self, job_id):
+        """
+        Entfernt einen wartenden oder fertigen Auftrag. False, wenn er läuft
+        oder sein Upload noch ankommt.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return True
+            if job.state in ("running", "receiving"):
+                return False
+            job.state = "cancelled"
+            del self._jobs[job_id]
+        shutil.rmtree(job.directory, ignore_errors=True)
+        return True
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {
+            "queued": states.count("queued"),
+            "receiving": states.count("receiving"),
+            "running": states.count("running"),
+            "finished": self._jobs_done,
+            "concurrency": self.concurrency,
+            "max_queued": self.max_queued,
+            "workers_per_job": self.workers,
+            "scan_cache_entries": len(self.scan_cache),
+        }
+
+    # --- Abarbeitung -----------------------------------------------------
+
+    def _new_shard_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def _runner(self):
+        # Warme Pools pro Auftrags-Thread (IsolatedPool ist nicht
+        # threadsicher); sie bleiben über alle Aufträge hinweg bestehen.
+        shard_pool = self._new_shard_pool()
+        try:
+            with IsolatedPool(
+                workers=self.workers,
+                timeout=self.file_timeout,
+                memory_limit_mb=self.file_memory_limit_mb,
+            ) as pool:
+                while True:
+                    job = self._queue.get()
+                    if job is None:
+                        return
+                    with self._lock:
+                        if job.state != "queued":
+                            continue
+                        job.state = "running"
+                        job.started = time.time()
+                    self._run(job, pool, shard_pool)
+                    if shard_pool is not None and shard_pool._broken:
+                        # Ein abgestürzter Montage-Prozess macht den Pool
+                        # unbrauchbar; der nächste Auftrag bekommt einen neuen.
+                        shard_pool.shutdown(wait=False)
+                        shard_pool = self._new_shard_pool()
+                    self._prune()
+        finally:
+            if shard_pool is not None:
+                shard_pool.shutdown()
+
+    def _run(self, job, pool, shard_pool=None):
+        try:
+            # Dateien, die schon im Scan-Cache stehen, werden auch für die
+            # Schätzung nicht mehr geöffnet
+            estimate = prescan_directory(job.source, pool=pool, scan_cache=self.scan_cache)
+
+            def on_progress(event):
+                job.progress = event
+
+            progress = ProgressModel(estimate, callback=on_progress)
+            quarantine = []
+            pages_by_size = collect_pages_by_size(
+                job.source,
+                progress=progress,
+                pool=pool,
+                known_failures=estimate["failed"],
+                quarantine=quarantine,
+                scan_cache=self.scan_cache,
+                digests=estimate["digests"],
+            )
+            if quarantine:
+                write_quarantine(quarantine, os.path.join(job.output_directory, "quarantaene"))
+
+            os.makedirs(job.output_directory, exist_ok=True)
+            job.outputs = write_imposed_pdfs(
+                pages_by_size,
+                job.output_directory,
+                progress=progress,
+                workers=self.workers,
+                image_options=self.image_options,
+                compression=self.compression,
+                shard_pool=shard_pool,
+            )
+            progress.finish()
+            job.quarantine = quarantine
+            job.state = "done"
+            logger.info("Auftrag %s fertig: %s", job.id, ", ".join(job.outputs) or "keine Ausgabe")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.state = "failed"
+            logger.error("Auftrag %s fehlgeschlagen: %s", job.id, job.error)
+        finally:
+            job.finished = time.time()
+            if job.uploaded:
+                shutil.rmtree(job.source, ignore_errors=True)
+            with self._lock:
+                self._jobs_done += 1
+
+    def _prune(self):
+        # Nur die letzten keep_jobs abgeschlossenen Aufträge behalten
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.state in ("done", "failed")]
+            expired = finished[:max(0, len(finished) - self.keep_jobs)]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+
+def _extract_pdfs(zip_path, target, max_bytes):
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".pdf")
+        ]
+        if sum(info.file_size for info in members) > max_bytes:
+            raise ValueError("ZIP-Inhalt zu groß")
+
+        used = set()
+        for info in members:
+            name = os.path.basename(info.filename.replace("\\", "/"))
+            base, ext = os.path.splitext(name)
+            n = 1
+            while name.lower() in used:
+                name = f"{base}_{n}{ext}"
+                n += 1
+            used.add(name.lower())
+            with archive.open(info) as src, open(os.path.join(target, name), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET    /status                       Auslastung und Grenzen
+    POST   /jobs                         {"source": "<Ordner>"} (JSON), oder
+                                         PDF/ZIP als Body (?name=datei.pdf)
+    GET    /jobs/<id>                    Status, Fortschritt, Ausgabedateien
+    GET    /jobs/<id>/files/<name>       Ausgabe-PDF herunterladen
+    DELETE /jobs/<id>                    Auftrag verwerfen
+    """
+
+    server_version = "hm-druck"
+
+    @property
+    def jobs(self):
+        return self.server.job_server
+
+    def address_string(self):
+        # Unix-Sockets haben keine (host, port)-Adresse
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _path_parts(self):
+        return [part for part in urlsplit(self.path).path.split("/") if part]
+
+    def do_GET(self):
+        parts = self._path_parts()
+
+        if parts == ["status"]:
+            self._send_json(200, self.jobs.stats())
+            return
+
+        if len(parts) >= 2 and parts[0] == "jobs" and _JOB_ID_RE.match(parts[1]):
+            job = self.jobs.get(parts[1])
+            if job is None:
+                self._send_error(404, "Auftrag unbekannt")
+                return
+            if len(parts) == 2:
+                self._send_json(200, job.to_dict())
+                return
+            if len(parts) == 4 and parts[2] == "files":
+                self._send_file(job.id, parts[3])
+                return
+
+        self._send_error(404, "Nicht gefunden")
+
+    def _send_file(self, job_id, name):
+        path = self.jobs.output_path(job_id, name)
+        if path is None:
+            self._send_error(404, "Datei nicht vorhanden")
+            return
+
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+    def do_POST(self):
+        if self._path_parts() != ["jobs"]:
+            self._send_error(404, "Nicht gefunden")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_error(411, "Content-Length fehlt")
+            return
+
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        try:
+            if content_type == "application/json":
+                data = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(data, dict) or not isinstance(data.get("source"), str):
+                    raise ValueError('JSON mit "source" erwartet')
+                job = self.jobs.submit_path(data["source"])
+            else:
+                max_bytes = self.server.max_upload_bytes
+                if length > max_bytes:
+                    self._send_error(413, f"Upload größer als {max_bytes // (1024 * 1024)} MB")
+                    self.close_connection = True
+                    return
+                name = parse_qs(urlsplit(self.path).query).get("name", [None])[0]
+                job = self.jobs.submit_upload(name, self.rfile, length, max_bytes)
+        except AdmissionError as e:
+            self.close_connection = True
+            self._send_error(503, str(e), {"Retry-After": str(RETRY_AFTER)})
+            return
+        except PermissionError as e:
+            self._send_error(403, str(e))
+            return
+        except (ValueError, zipfile.BadZipFile) as e:
+            self._send_error(400, str(e))
+            return
+
+        self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) != 2 or parts[0] != "jobs" or not _JOB_ID_RE.match(parts[1]):
+            self._send_error(404, "Nicht gefunden")
+            return
+        if not self.jobs.delete(parts[1]):
+            self._send_error(409, "Auftrag läuft noch oder wird noch hochgeladen")
+            return
+        self._send_json(200, {"deleted": parts[1]})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_http_server(job_server, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None,
+                       max_upload_mb=DEFAULT_MAX_UPLOAD_MB):
+    if unix_socket:
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix-Sockets werden auf diesem System nicht unterstützt")
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        httpd = UnixHTTPServer(unix_socket, JobRequestHandler)
+    else:
+        httpd = ThreadingHTTPServer((host, port), JobRequestHandler)
+        httpd.daemon_threads = True
+    httpd.job_server = job_server
+    httpd.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+    return httpd
+
+
+def main(argv=None):
+    config = load_config()
+    server_config = config.get("server") or {}
+
+    parser = argparse.ArgumentParser(description="Lokaler Auftrags-Server für die Montage.")
+    parser.add_argument("--host", default=server_config.get("host", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=server_config.get("port", DEFAULT_PORT))
+    parser.add_argument("--unix-socket", default=server_config.get("unix_socket"),
+                        help="statt TCP auf diesem Unix-Socket lauschen")
+    parser.add_argument("--work-dir", default=server_config.get("work_dir")
+                        or str(get_config_dir() / "server"))
+    parser.add_argument("--concurrency", type=int,
+                        default=server_config.get("concurrency", DEFAULT_CONCURRENCY))
+    parser.add_argument("--max-queued", type=int,
+                        default=server_config.get("max_queued", DEFAULT_MAX_QUEUED))
+    parser.add_argument("--workers", type=int, default=config.get("workers"),
+                        help="Prozesse pro Auftrag (Standard: CPU-Kerne / concurrency)")
+    parser.add_argument("--max-upload-mb", type=float,
+                        default=server_config.get("max_upload_mb", DEFAULT_MAX_UPLOAD_MB))
+    parser.add_argument("--allowed-root", action="append",
+                        default=list(server_config.get("allowed_roots") or []),
+                        help="Quellordner nur unterhalb davon zulassen (mehrfach möglich)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    job_server = JobServer(
+        args.work_dir,
+        concurrency=args.concurrency,
+        max_queued=args.max_queued,
+        workers=args.workers,
+        file_timeout=float(config.get("file_timeout", DEFAULT_FILE_TIMEOUT)),
+        file_memory_limit_mb=config.get("file_memory_limit_mb", DEFAULT_FILE_MEMORY_LIMIT_MB),
+        keep_jobs=server_config.get("keep_jobs", DEFAULT_KEEP_JOBS),
+        allowed_roots=args.allowed_root,
+        image_options=config.get("image_optimisation") or None,
+        compression=config.get("output_compression") or None,
+    )
+    httpd = create_http_server(job_server, args.host, args.port, args.unix_socket,
+                               args.max_upload_mb)
+    job_server.start()
+
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    logger.info("Auftrags-Server läuft auf %s (%d gleichzeitig, %d Prozesse je Auftrag)",
+                where, job_server.concurrency, job_server.workers)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        job_server.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+    return 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import sys
+
+    multiprocessing.freeze_support()
+    sys.exit(main())
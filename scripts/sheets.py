@@ -0,0 +1,175 @@
+import zlib
+
+from PyPDF2 import PageObject
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+)
+
+# (Bogenbreite, Bogenhöhe, Slots) -> SheetTemplate
+_SHEET_TEMPLATES = {}
+
+# Annotations-Einträge mit x/y-Paaren in Seitenkoordinaten
+_ANNOT_POINT_KEYS = ("/Rect", "/QuadPoints", "/Vertices", "/L", "/CL")
+# Verweise auf die Seite oder andere Annotationen derselben Seite
+_ANNOT_LINK_KEYS = ("/P", "/Parent", "/Popup", "/IRT")
+
+
+class SheetTemplate:
+    """
+    Vorgefertigter Bogen für eine Zielgröße und Slot-Anordnung
+    (nebeneinander, links beginnend). Hält die leere Seite und den fertigen
+    Inhalts-Stream, der jede Seite per Form-XObject an ihren Slot setzt.
+    Damit wird beim Platzieren kein Inhalts-Stream geparst und keine
+    Transformation neu berechnet.
+    """
+
+    def __init__(self, slot_width, slot_height, slots=2):
+        self.slot_width = slot_width
+        self.slot_height = slot_height
+        self.slots = slots
+        self.blank = PageObject.create_blank_page(width=slot_width * slots, height=slot_height)
+        self.slot_names = [NameObject(f"/HmSlot{n}") for n in range(slots)]
+
+        self.placements = [
+            f"q 1 0 0 1 {slot_width * n:.4f} 0 cm {name} Do Q\n".encode("ascii")
+            for n, name in enumerate(self.slot_names)
+        ]
+        # (erster Slot, Anzahl) -> Inhalt für die so belegten Slots
+        self._content = {}
+
+    def content(self, first_slot, count):
+        key = (first_slot, count)
+        data = self._content.get(key)
+        if data is None:
+            data = self._content[key] = b"".join(self.placements[first_slot:first_slot + count])
+        return data
+
+    def new_sheet(self, pages, first_slot=0):
+        sheet = PageObject()
+        sheet.update(self.blank)
+
+        xobjects = DictionaryObject()
+        for name, page in zip(self.slot_names[first_slot:], pages):
+            xobjects[name] = page_as_form(page)
+
+        resources = DictionaryObject()
+        resources[NameObject("/XObject")] = xobjects
+        sheet[NameObject("/Resources")] = resources
+
+        contents = DecodedStreamObject()
+        contents.set_data(self.content(first_slot, len(pages)))
+        sheet[NameObject("/Contents")] = contents
+        return sheet
+
+    def add_sheet(self, writer, pages, first_slot=0):
+        """
+        Hängt einen Bogen mit pages (ab Slot first_slot) an writer an und
+        übernimmt die Annotationen der Seiten, um den Slot-Versatz
+        verschoben.
+        """
+        sheet = writer.add_page(self.new_sheet(pages, first_slot))
+        annots = ArrayObject()
+        for n, page in enumerate(pages, first_slot):
+            annots.extend(_place_annotations(writer, sheet, page, self.slot_width * n))
+        if annots:
+            sheet[NameObject("/Annots")] = annots
+        return sheet
+
+
+def get_sheet_template(slot_width, slot_height, slots=2):
+    key = (round(slot_width, 3), round(slot_height, 3), slots)
+    template = _SHEET_TEMPLATES.get(key)
+    if template is None:
+        template = _SHEET_TEMPLATES[key] = SheetTemplate(slot_width, slot_height, slots)
+    return template
+
+
+def _shift_points(points, dx):
+    return ArrayObject(
+        FloatObject(float(value) + dx) if i % 2 == 0 else value
+        for i, value in enumerate(points.get_object())
+    )
+
+
+def _place_annotations(writer, sheet, page, dx):
+    # Kopiert die Annotationen von page in den writer. /P zeigt danach auf
+    # den Bogen; /Popup, /IRT und /Parent werden auf die Kopien umgebogen,
+    # Verweise aus der Seite heraus (z. B. Formularfelder) fallen weg, damit
+    # nicht die Quellseite samt Inhalt mitkopiert wird.
+    annots = page.get("/Annots")
+    if annots is None:
+        return []
+
+    copies = []
+    refs = {}
+    for ref in annots.get_object():
+        target = DictionaryObject()
+        new_ref = writer._add_object(target)
+        if isinstance(ref, IndirectObject):
+            refs[ref.idnum] = new_ref
+        copies.append((ref.get_object(), target, new_ref))
+
+    for annot, target, _ in copies:
+        copy = DictionaryObject()
+        for key, value in annot.items():
+            if key in _ANNOT_LINK_KEYS:
+                if isinstance(value, IndirectObject) and value.idnum in refs:
+                    copy[NameObject(key)] = refs[value.idnum]
+            elif key in _ANNOT_POINT_KEYS:
+                copy[NameObject(key)] = _shift_points(value, dx)
+            elif key == "/InkList":
+                copy[NameObject(key)] = ArrayObject(
+                    _shift_points(path, dx) for path in value.get_object()
+                )
+            else:
+                copy[NameObject(key)] = value
+        copy[NameObject("/P")] = sheet.indirect_reference
+        # clone holt /AP-Streams usw. aus der Quelldatei in den writer
+        target.update(copy.clone(writer))
+
+    return [new_ref for _, _, new_ref in copies]
+
+
+def page_as_form(page):
+    """
+    Verpackt eine Seite als Form-XObject. Ein einzelner Inhalts-Stream wird
+    mitsamt Filter unverändert übernommen; mehrere Streams werden einmal
+    dekodiert und zusammengefügt. /BBox ist die TrimBox, wie beim
+    Beschneiden in merge_page.
+    """
+    contents = page.raw_get("/Contents") if "/Contents" in page else None
+    if isinstance(contents, IndirectObject):
+        contents = contents.get_object()
+    if isinstance(contents, ArrayObject) and len(contents) == 1:
+        contents = contents[0].get_object()
+
+    if isinstance(contents, ArrayObject):
+        data = b"\n".join(part.get_object().get_data() for part in contents)
+        form = EncodedStreamObject()
+        form._data = zlib.compress(data)
+        form[NameObject("/Filter")] = NameObject("/FlateDecode")
+    elif contents is not None and "/Filter" in contents:
+        form = EncodedStreamObject()
+        form._data = contents._data
+        form[NameObject("/Filter")] = contents.raw_get("/Filter")
+        if "/DecodeParms" in contents:
+            form[NameObject("/DecodeParms")] = contents.raw_get("/DecodeParms")
+    else:
+        form = DecodedStreamObject()
+        form.set_data(contents._data if contents is not None else b"")
+
+    box = page.trimbox
+    form[NameObject("/Type")] = NameObject("/XObject")
+    form[NameObject("/Subtype")] = NameObject("/Form")
+    form[NameObject("/BBox")] = ArrayObject(
+        [FloatObject(box.left), FloatObject(box.bottom), FloatObject(box.right), FloatObject(box.top)]
+    )
+    if "/Resources" in page:
+        form[NameObject("/Resources")] = page.raw_get("/Resources")
+    return form
@@ -1,5 +1,21 @@
+import hashlib
+import json
+import logging
 import os
-from PyPDF2 import PdfReader, PdfWriter, PageObject, Transformation
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyPDF2 import PdfReader, PdfWriter, PageObject
+from PyPDF2.generic import IndirectObject
+
+from .compression import compress_writer, compression_profile, format_compression_report
+from .images import format_image_report, optimise_writer_images
+from .incremental import append_pages_incremental
+from .sheets import get_sheet_template
+
+logger = logging.getLogger(__name__)
 
 MM_PER_POINT = 0.352778  # mm/point
 
@@ -15,6 +31,17 @@ A_SIZES_MM = {
     "A8": (52, 74),
 }
 
+# Below this many 2-up entries the process start-up costs more than it saves.
+SHARD_MIN_ENTRIES = 64
+
+# Open source PDFs kept around while imposing 2-up sheets
+READER_CACHE_SIZE = 8
+
+# Remembers open half sheets / leftover A3 pages for append mode
+OUTPUT_STATE_FILE = ".hm-druck-state.json"
+
+PAGE_SIZE_KEYS = ["A0", "A1", "A2", "A3", "A4", "A5", "A6", "A7", "A8", "other"]
+
 
 def get_page_size_mm(page):
     box = page.mediabox
@@ -33,30 +60,234 @@ def classify_page_size(width_mm, height_mm, tolerance=5):
     return "other"
 
 
-def collect_pages_by_size(pdf_directory):
-    pdf_files = sorted(
+def list_pdf_files(pdf_directory):
+    return sorted(
         f for f in os.listdir(pdf_directory) if f.lower().endswith(".pdf")
     )
 
-    pages_by_size = {
-        size: [] for size in ["A0", "A1", "A2", "A3", "A4", "A5", "A6", "A7", "A8", "other"]
+
+def _first_page_mediabox(reader):
+    # Walks down the first /Kids chain only, so no other page objects get
+    # resolved. MediaBox is inheritable, so the nearest one on the way wins.
+    node = reader.trailer["/Root"]["/Pages"]
+    mediabox = node.get("/MediaBox")
+    for _ in range(64):
+        kids = node.get("/Kids")
+        if not kids:
+            break
+        node = kids[0].get_object()
+        mediabox = node.get("/MediaBox", mediabox)
+    return mediabox
+
+
+def prescan_pdf(path):
+    # With a file handle PdfReader only reads the xref and the objects that
+    # are asked for; given a path it would copy the whole file into memory.
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        page_count = int(reader.trailer["/Root"]["/Pages"]["/Count"])
+        mediabox = _first_page_mediabox(reader)
+
+    size = "other"
+    if mediabox is not None:
+        x0, y0, x1, y1 = (float(v) for v in mediabox)
+        size = classify_page_size(abs(x1 - x0) * MM_PER_POINT, abs(y1 - y0) * MM_PER_POINT)
+
+    return page_count, size
+
+
+def count_output_sheets(counts_by_size):
+    def count(size):
+        return counts_by_size.get(size, 0) or 0
+
+    sheets = {
+        "A0": count("A0") + (count("A1") + 1) // 2,
+        "A2": count("A2") + count("A3") // 2,
+        "A3": count("A3") % 2,
+        "A4": count("A4") + (count("A5") + 1) // 2,
+    }
+    return {fmt: n for fmt, n in sheets.items() if n}
+
+
+def _run_per_file(func, paths, pool=None):
+    # Yields (index, ok, result_or_reason). Without a pool everything runs
+    # in-process; exceptions still only fail the one file.
+    if pool is not None:
+        yield from pool.map(func, [(path,) for path in paths])
+        return
+
+    for index, path in enumerate(paths):
+        try:
+            result = func(path)
+        except Exception as e:
+            yield index, False, f"{type(e).__name__}: {e}"
+        else:
+            yield index, True, result
+
+
+def prescan_directory(pdf_directory, pool=None, scan_cache=None):
+    # Cheap estimate before the real scan: only the trailer, /Pages /Count and
+    # the first page's MediaBox are read. All pages of a file are assumed to
+    # share the first page's format. Files that fail here are listed in
+    # "failed" so the real scan can skip them instead of waiting again.
+    # With a scan_cache (see collect_pages_by_size) files already in it are
+    # counted from the cache and not opened at all; their digests are
+    # returned in "digests" for the real scan.
+    pages_by_size = {size: 0 for size in PAGE_SIZE_KEYS}
+    files = 0
+    pages = 0
+    failed = {}
+    digests = {}
+
+    paths = [os.path.join(pdf_directory, f) for f in list_pdf_files(pdf_directory)]
+    if scan_cache is not None:
+        uncached = []
+        for path in paths:
+            digests[path] = file_digest(path)
+            sizes = scan_cache.get(digests[path])
+            if sizes is None:
+                uncached.append(path)
+                continue
+            files += 1
+            pages += len(sizes)
+            for size in sizes:
+                pages_by_size[size] += 1
+        paths = uncached
+
+    for index, ok, result in _run_per_file(prescan_pdf, paths, pool):
+        if not ok:
+            logger.warning("Vorab-Zählung für %s fehlgeschlagen: %s",
+                           os.path.basename(paths[index]), result)
+            failed[paths[index]] = result
+            continue
+        page_count, size = result
+        files += 1
+        pages += page_count
+        pages_by_size[size] += page_count
+
+    return {
+        "files": files,
+        "pages": pages,
+        "pages_by_size": pages_by_size,
+        "sheets_by_format": count_output_sheets(pages_by_size),
+        "failed": failed,
+        "digests": digests,
     }
 
-    for filename in pdf_files:
+
+def scan_pdf(path):
+    reader = PdfReader(path)
+    sizes = []
+    for page in reader.pages:
+        width_mm, height_mm = get_page_size_mm(page)
+        sizes.append(classify_page_size(width_mm, height_mm))
+    return sizes
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def collect_pages_by_size(pdf_directory, progress=None, pool=None, known_failures=None,
+                          quarantine=None, scan_cache=None, digests=None):
+    """
+    pool: an isolation.IsolatedPool to parse each file in a separate process
+    with timeout and memory limit. known_failures ({path: reason}, e.g. from
+    prescan_directory) are not parsed again. Every skipped file is appended
+    to quarantine as {"path": ..., "reason": ...}.
+    scan_cache: optional mapping {content digest: page sizes} that is
+    consulted before parsing and filled afterwards (kept warm by the job
+    server across jobs). digests ({path: digest}, e.g. from
+    prescan_directory) saves hashing those files a second time.
+    """
+    known_failures = known_failures or {}
+    if quarantine is None:
+        quarantine = []
+
+    pages_by_size = {size: [] for size in PAGE_SIZE_KEYS}
+
+    if progress is not None:
+        progress.start_phase("scan")
+
+    paths = []
+    skipped = []
+    for filename in list_pdf_files(pdf_directory):
         path = os.path.join(pdf_directory, filename)
-        reader = PdfReader(path)
-        for page_index, page in enumerate(reader.pages):
-            width_mm, height_mm = get_page_size_mm(page)
-            size = classify_page_size(width_mm, height_mm)
+        if path in known_failures:
+            skipped.append({"path": path, "reason": known_failures[path]})
+        else:
+            paths.append(path)
+
+    known_digests = digests or {}
+    sizes_by_file = [None] * len(paths)
+    digests = [None] * len(paths)
+    if scan_cache is not None:
+        for index, path in enumerate(paths):
+            digests[index] = known_digests.get(path) or file_digest(path)
+            sizes = scan_cache.get(digests[index])
+            if sizes is not None:
+                sizes_by_file[index] = sizes
+                if progress is not None:
+                    progress.advance(len(sizes))
+
+    to_scan = [index for index in range(len(paths)) if sizes_by_file[index] is None]
+    for n, ok, result in _run_per_file(scan_pdf, [paths[i] for i in to_scan], pool):
+        index = to_scan[n]
+        filename = os.path.basename(paths[index])
+        if not ok:
+            skipped.append({"path": paths[index], "reason": result})
+            continue
+        sizes_by_file[index] = result
+        if scan_cache is not None:
+            scan_cache[digests[index]] = result
+        if progress is not None:
+            progress.advance(len(result))
+        logger.info("%s: %d Seite(n) gelesen", filename, len(result))
+
+    # Keep the sorted file order no matter in which order workers finished
+    for path, sizes in zip(paths, sizes_by_file):
+        if sizes is None:
+            continue
+        for page_index, size in enumerate(sizes):
             pages_by_size[size].append(
                 {"path": path, "page_index": page_index}
             )
 
+    if skipped:
+        skipped.sort(key=lambda entry: entry["path"])
+        logger.warning("%d Datei(en) übersprungen:", len(skipped))
+        for entry in skipped:
+            logger.warning("  %s – %s", os.path.basename(entry["path"]), entry["reason"])
+        quarantine.extend(skipped)
+
     return pages_by_size
 
 
+def write_quarantine(quarantine, quarantine_directory):
+    # Copies skipped files (the sources stay where they are) and writes the
+    # reasons next to them.
+    if not quarantine:
+        return None
+
+    os.makedirs(quarantine_directory, exist_ok=True)
+    for entry in quarantine:
+        try:
+            shutil.copy2(entry["path"], quarantine_directory)
+        except OSError as e:
+            logger.warning("Konnte %s nicht in die Quarantäne kopieren: %s", entry["path"], e)
+
+    reasons_path = os.path.join(quarantine_directory, "gruende.txt")
+    with open(reasons_path, "w", encoding="utf-8") as f:
+        for entry in quarantine:
+            f.write(f"{os.path.basename(entry['path'])}\t{entry['reason']}\n")
+    return reasons_path
 
-def add_single_pages(writer, entries):
+
+def add_single_pages(writer, entries, progress=None):
     by_path = {}
     for info in entries:
         by_path.setdefault(info["path"], []).append(info["page_index"])
@@ -65,104 +296,392 @@ def add_single_pages(writer, entries):
         reader = PdfReader(path)
         for idx in indices:
             writer.add_page(reader.pages[idx])
+            if progress is not None:
+                progress.advance()
+        release_reader(writer, reader)
 
 
 def merge_two_pages_side_by_side(page_left, page_right):
     page_width = float(page_left.mediabox.width)
     page_height = float(page_left.mediabox.height)
 
-    merged = PageObject.create_blank_page(width=page_width * 2, height=page_height)
-
-    merged.merge_page(page_right)
-    merged.add_transformation(Transformation().translate(tx=page_width, ty=0))
-    merged.merge_page(page_left)
+    template = get_sheet_template(page_width, page_height)
+    return template.new_sheet([page_left, page_right])
+
+
+def release_reader(writer, reader):
+    # PdfWriter remembers cloned objects per id(reader). Once the reader is
+    # garbage collected the next reader may get the same id and would be
+    # handed the old reader's objects (e.g. a font with the same number), so
+    # the mapping has to go together with the reader.
+    writer.reset_translation(reader)
+
+
+class _ReaderCache:
+    # Small LRU of open readers: consecutive entries mostly come from the
+    # same few files, and opening a reader (read + flatten the page tree)
+    # costs far more than placing a page.
+    def __init__(self, writer, size=READER_CACHE_SIZE):
+        self.writer = writer
+        self.size = size
+        self._readers = OrderedDict()
+
+    def page(self, info):
+        path = info["path"]
+        reader = self._readers.get(path)
+        if reader is None:
+            reader = PdfReader(path)
+            self._readers[path] = reader
+            if len(self._readers) > self.size:
+                _, evicted = self._readers.popitem(last=False)
+                release_reader(self.writer, evicted)
+        else:
+            self._readers.move_to_end(path)
+        return reader.pages[info["page_index"]]
 
-    return merged
+    def close(self):
+        for reader in self._readers.values():
+            release_reader(self.writer, reader)
+        self._readers.clear()
 
 
-def add_two_up_pages(writer, entries):
+def add_two_up_pages(writer, entries, progress=None):
+    readers = _ReaderCache(writer)
     for i in range(0, len(entries), 2):
-        info_left = entries[i]
-        info_right = entries[i + 1] if i + 1 < len(entries) else None
+        page_left = readers.page(entries[i])
+        pages = [page_left]
+        if i + 1 < len(entries):
+            pages.append(readers.page(entries[i + 1]))
+
+        # A single leftover page stays alone on the left half of the sheet
+        template = get_sheet_template(
+            float(page_left.mediabox.width), float(page_left.mediabox.height)
+        )
+        template.add_sheet(writer, pages)
+        if progress is not None:
+            progress.advance()
+    readers.close()
+
+
+def split_into_shards(entries, shard_count):
+    # Every shard except the last holds an even number of entries, so the
+    # left/right pairing is exactly the one of a single serial pass.
+    pair_count = (len(entries) + 1) // 2
+    shard_count = max(1, min(shard_count, pair_count))
+    pairs_per_shard, extra = divmod(pair_count, shard_count)
+
+    shards = []
+    start = 0
+    for n in range(shard_count):
+        pairs = pairs_per_shard + (1 if n < extra else 0)
+        end = min(start + pairs * 2, len(entries))
+        shards.append(entries[start:end])
+        start = end
+    return [shard for shard in shards if shard]
+
+
+def _impose_shard(entries, partial_path):
+    writer = PdfWriter()
+    add_two_up_pages(writer, entries)
+    with open(partial_path, "wb") as f:
+        writer.write(f)
+    return len(writer.pages)
+
+
+def add_two_up_pages_sharded(writer, entries, workers, progress=None, shard_pool=None):
+    # shard_pool: an existing ProcessPoolExecutor whose workers (and their
+    # sheet templates) stay warm between calls; without one a pool is
+    # started for this call only.
+    shards = split_into_shards(entries, workers)
+    tmp_dir = tempfile.mkdtemp(prefix="hm-druck-shards-")
+    try:
+        partial_paths = [
+            os.path.join(tmp_dir, f"part_{n:04d}.pdf") for n in range(len(shards))
+        ]
+        if shard_pool is not None:
+            _run_shards(shard_pool, shards, partial_paths, progress)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+                _run_shards(pool, shards, partial_paths, progress)
+
+        # Structural merge: page objects and their (still encoded) content
+        # streams are copied as they are, nothing is merged or re-rendered.
+        for path in partial_paths:
+            reader = PdfReader(path)
+            for page in reader.pages:
+                writer.add_page(page)
+            release_reader(writer, reader)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _run_shards(pool, shards, partial_paths, progress):
+    futures = {
+        pool.submit(_impose_shard, shard, path): path
+        for shard, path in zip(shards, partial_paths)
+    }
+    for future in as_completed(futures):
+        sheets = future.result()
+        if progress is not None:
+            progress.advance(sheets)
 
-        reader_left = PdfReader(info_left["path"])
-        page_left = reader_left.pages[info_left["page_index"]]
 
-        if info_right is not None:
-            reader_right = PdfReader(info_right["path"])
-            page_right = reader_right.pages[info_right["page_index"]]
-            merged = merge_two_pages_side_by_side(page_left, page_right)
-        else:
-            page_width = float(page_left.mediabox.width)
-            page_height = float(page_left.mediabox.height)
-            merged = PageObject.create_blank_page(width=page_width * 2, height=page_height)
-            merged.merge_page(page_left)
+def _add_two_up(writer, entries, progress=None, workers=1, shard_pool=None):
+    if workers > 1 and len(entries) >= SHARD_MIN_ENTRIES:
+        logger.info("%d Seiten werden in bis zu %d Prozessen montiert", len(entries), workers)
+        add_two_up_pages_sharded(writer, entries, workers, progress, shard_pool)
+    else:
+        add_two_up_pages(writer, entries, progress)
+
 
-        writer.add_page(merged)
+def default_worker_count():
+    return os.cpu_count() or 1
 
 
-def write_imposed_pdfs(pages_by_size, output_directory):
+def fill_half_sheet(writer, half_sheet, page_right):
+    # Only the right slot is built here, with the same template placement
+    # as add_two_up_pages. append_pages_incremental lays it onto the open
+    # sheet in the existing output (fill_page_ref), so the left page's
+    # content and resources are not written a second time.
+    template = get_sheet_template(
+        float(half_sheet.mediabox.width) / 2, float(half_sheet.mediabox.height)
+    )
+    return template.add_sheet(writer, [page_right], first_slot=1)
+
+
+def load_output_state(output_directory):
+    path = os.path.join(output_directory, OUTPUT_STATE_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if isinstance(data, dict):
+                return data
+    except Exception:
+        pass
+    return {}
+
+
+def save_output_state(output_directory, state):
+    # Saved after every output file, atomically: if a later format fails,
+    # the state still matches what has already been appended.
+    path = os.path.join(output_directory, OUTPUT_STATE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_output(writer, path, append, fill_page_ref=None, fmt=None,
+                  output_options=None):
+    # Returns the page count of the file after writing and the
+    # (object number, generation) of its last page. output_options holds
+    # the image/compression settings and report dicts of write_imposed_pdfs.
+    output_options = output_options or {}
+
+    image_options = output_options.get("image_options")
+    if image_options:
+        report = optimise_writer_images(writer, image_options)
+        logger.info(format_image_report(fmt, report))
+        image_reports = output_options.get("image_reports")
+        if image_reports is not None:
+            image_reports[fmt] = report
+
+    compression = compression_profile(output_options.get("compression"), fmt)
+    compression_report = compress_writer(writer, compression)
+
+    start = time.perf_counter()
+    if append and os.path.exists(path):
+        page_count, page_refs = append_pages_incremental(path, writer, fill_page_ref)
+        last_page_ref = page_refs[-1] if page_refs else None
+    else:
+        with open(path, "wb") as f:
+            writer.write(f)
+        page_count = len(writer.pages)
+        # PdfWriter keeps its object numbers in the written file
+        last_ref = writer.pages[-1].indirect_reference if page_count else None
+        last_page_ref = (last_ref.idnum, last_ref.generation) if last_ref else None
+
+    compression_report["write_seconds"] = time.perf_counter() - start
+    compression_report["file_bytes"] = os.path.getsize(path)
+    if compression != "fast":
+        logger.info(format_compression_report(fmt, compression_report))
+    compression_reports = output_options.get("compression_reports")
+    if compression_reports is not None:
+        compression_reports[fmt] = compression_report
+    return page_count, last_page_ref
+
+
+def _read_page(reader, page_ref):
+    # Reads one page by (object number, generation) without loading the
+    # page tree, so the cost does not grow with the size of the output PDF.
+    # Output pages carry their own MediaBox, nothing is inherited.
+    ref = IndirectObject(page_ref[0], page_ref[1], reader)
+    page = PageObject(reader, ref)
+    page.update(ref.get_object())
+    return page
+
+
+def _write_two_up_format(fmt, single, two_up, output_directory, state, append,
+                         progress, workers, output_options, shard_pool=None):
+    # Writes one target format made of single pages plus 2-up sheets
+    # (A0 = A0 + A1, A4 = A4 + A5) and tracks the trailing half sheet.
+    path = os.path.join(output_directory, f"{fmt}_output.pdf")
+    exists = append and os.path.exists(path)
+    previous = state.get(fmt) or {}
+    half_sheet = previous.get("half_sheet") if exists else None
+
+    writer = PdfWriter()
+    fill_page_ref = None
+
+    if half_sheet is not None and two_up:
+        info = two_up[0]
+        two_up = two_up[1:]
+        with open(path, "rb") as f:
+            sheet_reader = PdfReader(f)
+            if isinstance(half_sheet, int):
+                # State files written before object numbers were stored
+                ref = sheet_reader.pages[half_sheet].indirect_reference
+                half_sheet = [ref.idnum, ref.generation]
+            sheet = _read_page(sheet_reader, half_sheet)
+            page_reader = PdfReader(info["path"])
+            page_right = page_reader.pages[info["page_index"]]
+            fill_half_sheet(writer, sheet, page_right)
+            release_reader(writer, page_reader)
+        fill_page_ref = tuple(half_sheet)
+        half_sheet = None
+        if progress is not None:
+            progress.advance()
+
+    if single:
+        add_single_pages(writer, single, progress)
+    if two_up:
+        _add_two_up(writer, two_up, progress, workers, shard_pool)
+
+    if len(writer.pages) == 0:
+        return None
+
+    _, last_page_ref = _write_output(writer, path, append, fill_page_ref, fmt, output_options)
+
+    if len(two_up) % 2:
+        half_sheet = list(last_page_ref)
+    state[fmt] = {"half_sheet": half_sheet}
+    save_output_state(output_directory, state)
+    return path
+
+
+def write_imposed_pdfs(pages_by_size, output_directory, progress=None, workers=1,
+                       append=False, image_options=None, image_reports=None,
+                       compression=None, compression_reports=None, shard_pool=None):
+    """
+    append: add the new sheets to existing output PDFs as an incremental
+    update instead of rewriting them. A half sheet left open by the previous
+    run (odd A1/A5 count) is filled with the first new page, a leftover A3
+    page is paired with the first new A3 page.
+
+    image_options: downsample embedded images to a target DPI before
+    writing (see images.DEFAULT_IMAGE_OPTIONS). image_reports, if given,
+    receives the size/time report per output format.
+
+    compression: output profile ("fast", "balanced", "smallest"), either
+    one for all formats or per format, e.g. {"default": "balanced",
+    "A0": "fast"} (see compression.compress_writer). compression_reports,
+    if given, receives stream bytes, file size and write time per format.
+
+    shard_pool: ProcessPoolExecutor reused for the parallel 2-up imposition
+    (workers > 1) instead of starting one per format.
+    """
     os.makedirs(output_directory, exist_ok=True)
 
-    output_files = {}
+    output_options = {
+        "image_options": image_options,
+        "image_reports": image_reports,
+        "compression": compression,
+        "compression_reports": compression_reports,
+    }
+    # Fail on an unknown profile before any work is done
+    for fmt in ("A0", "A2", "A3", "A4"):
+        compression_profile(compression, fmt)
+
+    state = load_output_state(output_directory) if append else {}
+
+    # The open A3 page is read back from A3_output.pdf itself, so it does
+    # not depend on the source file still existing or being unchanged.
+    a3_path = os.path.join(output_directory, "A3_output.pdf")
+    a3_all = list(pages_by_size.get("A3", []) or [])
+    pending_a3 = None
+    if (state.get("A3") or {}).get("leftover") and a3_all:
+        if os.path.exists(a3_path):
+            pending_a3 = {"path": a3_path, "page_index": 0}
+            a3_all.insert(0, pending_a3)
+        else:
+            logger.warning("Offene A3-Seite nicht mehr vorhanden: %s", a3_path)
 
-    a0_writer = PdfWriter()
-    a0_single = pages_by_size.get("A0", []) or []
-    a1_two_up = pages_by_size.get("A1", []) or []
+    if progress is not None:
+        counts = {size: len(entries or []) for size, entries in pages_by_size.items()}
+        counts["A3"] = len(a3_all)
+        progress.start_phase("write", sum(count_output_sheets(counts).values()))
 
-    if a0_single:
-        add_single_pages(a0_writer, a0_single)
-    if a1_two_up:
-        add_two_up_pages(a0_writer, a1_two_up)
+    output_files = {}
 
-    if len(a0_writer.pages) > 0:
-        a0_path = os.path.join(output_directory, "A0_output.pdf")
-        with open(a0_path, "wb") as f:
-            a0_writer.write(f)
+    a0_path = _write_two_up_format(
+        "A0",
+        pages_by_size.get("A0", []) or [],
+        pages_by_size.get("A1", []) or [],
+        output_directory, state, append, progress, workers, output_options, shard_pool,
+    )
+    if a0_path:
         output_files["A0"] = a0_path
 
     a2_writer = PdfWriter()
     a2_single = pages_by_size.get("A2", []) or []
-    a3_all = pages_by_size.get("A3", []) or []
 
     if a2_single:
-        add_single_pages(a2_writer, a2_single)
+        add_single_pages(a2_writer, a2_single, progress)
 
     pair_count = (len(a3_all) // 2) * 2
     a3_pairs = a3_all[:pair_count]
     a3_leftover = a3_all[pair_count:]
 
     if a3_pairs:
-        add_two_up_pages(a2_writer, a3_pairs)
+        _add_two_up(a2_writer, a3_pairs, progress, workers, shard_pool)
 
     if len(a2_writer.pages) > 0:
         a2_path = os.path.join(output_directory, "A2_output.pdf")
-        with open(a2_path, "wb") as f:
-            a2_writer.write(f)
+        _write_output(a2_writer, a2_path, append, None, "A2", output_options)
         output_files["A2"] = a2_path
+        if pending_a3:
+            # The previous leftover is now part of an A2 sheet
+            state["A3"] = {"leftover": False}
+            save_output_state(output_directory, state)
 
     if a3_leftover:
         a3_writer = PdfWriter()
-        add_single_pages(a3_writer, a3_leftover)
+        add_single_pages(a3_writer, a3_leftover, progress)
         if len(a3_writer.pages) > 0:
-            a3_path = os.path.join(output_directory, "A3_output.pdf")
-            with open(a3_path, "wb") as f:
-                a3_writer.write(f)
+            # A3_output.pdf only ever holds the current leftover page; the
+            # previous one has been placed on an A2 sheet by now.
+            _write_output(a3_writer, a3_path, False, None, "A3", output_options)
             output_files["A3"] = a3_path
-
-    a4_writer = PdfWriter()
-    a4_single = pages_by_size.get("A4", []) or []
-    a5_two_up = pages_by_size.get("A5", []) or []
-
-    if a4_single:
-        add_single_pages(a4_writer, a4_single)
-    if a5_two_up:
-        add_two_up_pages(a4_writer, a5_two_up)
-
-    if len(a4_writer.pages) > 0:
-        a4_path = os.path.join(output_directory, "A4_output.pdf")
-        with open(a4_path, "wb") as f:
-            a4_writer.write(f)
+        state["A3"] = {"leftover": True}
+        save_output_state(output_directory, state)
+    elif a3_all:
+        state["A3"] = {"leftover": False}
+        save_output_state(output_directory, state)
+        if pending_a3:
+            os.remove(a3_path)
+
+    a4_path = _write_two_up_format(
+        "A4",
+        pages_by_size.get("A4", []) or [],
+        pages_by_size.get("A5", []) or [],
+        output_directory, state, append, progress, workers, output_options, shard_pool,
+    )
+    if a4_path:
         output_files["A4"] = a4_path
 
+    # Also replaces a state file left by an earlier run without append
+    save_output_state(output_directory, state)
+
     return output_files